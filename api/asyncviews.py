@@ -0,0 +1,137 @@
+"""
+Async read endpoints
+
+Views mixing in `AsyncReadMixin` can define an async handler next to a sync
+one, e.g. `alist` next to `list`. The async handlers run the same DRF steps
+as the sync ones, but load rows with the async ORM, so under ASGI a request
+waiting on the database leaves the event loop to other requests.
+
+`async_read_urls` swaps such views in for GET and HEAD requests; other
+methods keep going to the sync views. With `ASYNC_READ_VIEWS` off (the
+default, for WSGI) the URLs are left alone, as a WSGI server would run every
+async view in an event loop of its own.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.urls import URLPattern, URLResolver
+
+
+async def alist(queryset):
+    """Evaluate `queryset`, prefetches included, with the async ORM"""
+    return [obj async for obj in queryset]
+
+
+class AsyncReadMixin:
+    """Async counterparts of the DRF plumbing used by read handlers"""
+
+    async def adispatch(self, request, *args, **kwargs):
+        """`APIView.dispatch`, awaiting an async handler"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication may load the user (see ClaimsJWTAuthentication)
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, f"a{self.get_handler_name(request)}")
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+    def get_handler_name(self, request):
+        action_map = getattr(self, "action_map", None)
+        if action_map is not None:
+            return action_map[request.method.lower()]
+        return "get"
+
+    async def aget_object(self):
+        """`GenericAPIView.get_object`, loading the row with `aget`"""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except queryset.model.DoesNotExist:
+            raise Http404(
+                "No %s matches the given query."
+                % queryset.model._meta.object_name
+            )
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self
+        )
+
+
+def get_async_view(view):
+    """
+    Return a view serving GET and HEAD through the async handler of `view`'s
+    class, and everything else through `view`; None without such a handler
+    """
+    cls = getattr(view, "cls", None)
+    if cls is None or not issubclass(cls, AsyncReadMixin):
+        return None
+    actions = getattr(view, "actions", None)
+    handler = actions.get("get") if actions is not None else "get"
+    if handler is None or not hasattr(cls, f"a{handler}"):
+        return None
+
+    sync_view = sync_to_async(view)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return await sync_view(request, *args, **kwargs)
+
+        # As `as_view` would set the instance up
+        self = cls(**view.initkwargs)
+        if actions is not None:
+            self.action_map = {**actions, "head": actions["get"]}
+            for method, action in self.action_map.items():
+                setattr(self, method, getattr(self, action))
+        self.setup(request, *args, **kwargs)
+        return await self.adispatch(request, *args, **kwargs)
+
+    async_view.cls = cls
+    async_view.initkwargs = view.initkwargs
+    if actions is not None:
+        async_view.actions = actions
+    async_view.csrf_exempt = True
+    return async_view
+
+
+def async_read_urls(patterns):
+    """Return `patterns` with the async views swapped in, recursively"""
+    swapped = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern,
+                async_read_urls(pattern.url_patterns),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            )
+        elif isinstance(pattern, URLPattern):
+            async_view = get_async_view(pattern.callback)
+            if async_view is not None:
+                pattern = URLPattern(
+                    pattern.pattern,
+                    async_view,
+                    pattern.default_args,
+                    pattern.name,
+                )
+        swapped.append(pattern)
+    return swapped
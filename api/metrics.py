@@ -0,0 +1,396 @@
+"""
+Per-request instrumentation
+
+`InstrumentationMiddleware` counts the queries and database time of each
+request through an execute wrapper on every connection, times serialization through
+`TimedSerializerMixin` and `TimedJSONRenderer`, reports all of it in a
+`Server-Timing` header and adds it to per-view histograms. `metrics_view`
+serves the histograms in the Prometheus text format.
+
+It also serves the statistics of the database connection pools, when
+`DATABASES` configures one.
+
+The histograms and pools live in process memory, so every worker reports
+its own; scrape each worker, or aggregate them in Prometheus. Set
+`METRICS_SAMPLE_RATE` below 1 to instrument only a share of the requests.
+
+`metrics_view` answers 404 unless `METRICS_TOKEN` is set, and then only to
+requests bearing it (`Authorization: Bearer <token>`, as set with
+`authorization` in a Prometheus scrape config).
+"""
+
+import hmac
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# (name, help, buckets) of every histogram, in exposition order
+METRICS = [
+    (
+        "http_request_duration_seconds",
+        "Time spent handling the request",
+        DURATION_BUCKETS,
+    ),
+    (
+        "http_request_db_queries",
+        "Database queries run by the request",
+        QUERY_BUCKETS,
+    ),
+    (
+        "http_request_db_duration_seconds",
+        "Time spent waiting on the database",
+        DURATION_BUCKETS,
+    ),
+    (
+        "http_request_serialization_duration_seconds",
+        "Time spent serializing and rendering the response",
+        DURATION_BUCKETS,
+    ),
+]
+
+# (name, type, help, value from the pool's statistics) of the connection
+# pool metrics; psycopg leaves out counters that are still zero
+POOL_METRICS = [
+    (
+        "db_pool_connections",
+        "gauge",
+        "Connections open in the pool",
+        lambda stats: stats["pool_size"],
+    ),
+    (
+        "db_pool_connections_in_use",
+        "gauge",
+        "Connections checked out by requests",
+        lambda stats: stats["pool_size"] - stats["pool_available"],
+    ),
+    (
+        "db_pool_connections_max",
+        "gauge",
+        "Connections the pool may open",
+        lambda stats: stats["pool_max"],
+    ),
+    (
+        "db_pool_requests_waiting",
+        "gauge",
+        "Requests waiting for a connection",
+        lambda stats: stats.get("requests_waiting", 0),
+    ),
+    (
+        "db_pool_requests_total",
+        "counter",
+        "Connections requested from the pool",
+        lambda stats: stats.get("requests_num", 0),
+    ),
+    (
+        "db_pool_waits_total",
+        "counter",
+        "Requests that had to wait for a connection",
+        lambda stats: stats.get("requests_queued", 0),
+    ),
+    (
+        "db_pool_wait_seconds_total",
+        "counter",
+        "Time spent waiting for a connection",
+        lambda stats: stats.get("requests_wait_ms", 0) / 1000,
+    ),
+    (
+        "db_pool_timeouts_total",
+        "counter",
+        "Requests that gave up waiting for a connection",
+        lambda stats: stats.get("requests_errors", 0),
+    ),
+    (
+        "db_pool_connections_opened_total",
+        "counter",
+        "Connections opened by the pool",
+        lambda stats: stats.get("connections_num", 0),
+    ),
+    (
+        "db_pool_connections_recycled_total",
+        "counter",
+        "Connections closed by the pool: past their lifetime, idle, broken "
+        "or returned in a bad state",
+        lambda stats: max(
+            0, stats.get("connections_num", 0) - stats["pool_size"]
+        ),
+    ),
+    (
+        "db_pool_connections_lost_total",
+        "counter",
+        "Connections that failed the health check on checkout",
+        lambda stats: stats.get("connections_lost", 0),
+    ),
+]
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Histograms of every metric, per view and method"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, labels, values):
+        with self.lock:
+            for (name, _, buckets), value in zip(METRICS, values):
+                key = (name, labels)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(buckets)
+                self.histograms[key].observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self):
+        """Return the histograms in the Prometheus text format"""
+        lines = []
+        with self.lock:
+            for name, description, buckets in METRICS:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+
+                series = sorted(
+                    (labels, histogram)
+                    for (metric, labels), histogram in self.histograms.items()
+                    if metric == name
+                )
+                for labels, histogram in series:
+                    label_text = ",".join(
+                        f'{key}="{value}"' for key, value in labels
+                    )
+                    cumulative = 0
+                    for bound, count in zip(
+                        [*buckets, "+Inf"], histogram.counts
+                    ):
+                        cumulative += count
+                        lines.append(
+                            f'{name}_bucket{{{label_text},le="{bound}"}} '
+                            f"{cumulative}"
+                        )
+                    lines.append(f"{name}_sum{{{label_text}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{label_text}}} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Queries and timings of one request, fed by `record_query`"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0
+        self.serialization_time = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+# Metrics of the request being handled, None when it is not sampled
+current = ContextVar("request_metrics", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper of every connection, counting into the current request
+
+    Async views query from a worker thread with a connection of its own; the
+    context variable follows them there, a wrapper entered by the middleware
+    would not.
+    """
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_wrapper(connection, **kwargs):
+    # First in line, as `execute_wrapper()` blocks pop the last wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+connection_created.connect(install_wrapper)
+
+
+@contextmanager
+def timing_serialization():
+    """Count the time spent in the block as serialization"""
+    metrics = current.get()
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialization_time += time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """Times producing `serializer.data` as serialization"""
+
+    @property
+    def data(self):
+        with timing_serialization():
+            return super().data
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """Times encoding responses as serialization"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timing_serialization():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+def get_view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.url_name or match.view_name or "unnamed"
+
+
+class InstrumentationMiddleware:
+    """Measures sampled requests; keep it first in `MIDDLEWARE`"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported
+        for connection in connections.all():
+            install_wrapper(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.report(request, response, metrics)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.report(request, response, metrics)
+
+    def report(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.start
+
+        # Serialization includes the queries it runs, e.g. prefetches
+        db = f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries}"'
+        serialize = f"serialize;dur={metrics.serialization_time * 1000:.2f}"
+        response["Server-Timing"] = (
+            f"{db}, {serialize}, total;dur={duration * 1000:.2f}"
+        )
+
+        labels = (("view", get_view_name(request)), ("method", request.method))
+        registry.observe(
+            labels,
+            [
+                duration,
+                metrics.queries,
+                metrics.db_time,
+                metrics.serialization_time,
+            ],
+        )
+        return response
+
+
+def get_pools():
+    """Return `(alias, pool)` for every database with a connection pool"""
+    pools = []
+    for alias in connections:
+        connection = connections[alias]
+        if connection.settings_dict["OPTIONS"].get("pool"):
+            pools.append((alias, connection.pool))
+    return pools
+
+
+def render_pools():
+    """Return the pool statistics in the Prometheus text format"""
+    stats = [(alias, pool.get_stats()) for alias, pool in get_pools()]
+    if not stats:
+        return ""
+
+    lines = []
+    for name, metric_type, description, get_value in POOL_METRICS:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for alias, pool_stats in stats:
+            lines.append(
+                f'{name}{{database="{alias}"}} {get_value(pool_stats)}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404()
+    expected = f"Bearer {token}"
+    if not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), expected.encode()
+    ):
+        response = HttpResponse(status=401)
+        response["WWW-Authenticate"] = "Bearer"
+        return response
+
+    return HttpResponse(
+        registry.render() + render_pools(),
+        content_type="text/plain; version=0.0.4",
+    )
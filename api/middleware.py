@@ -0,0 +1,38 @@
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseMiddleware
+
+
+class WhiteNoiseMiddleware(BaseMiddleware):
+    """
+    WhiteNoise that can sit in an async middleware chain
+
+    WhiteNoise only handles sync requests, so under ASGI Django would run the
+    rest of the chain, views included, through `async_to_sync`. Static files
+    are still served from a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,113 @@
+"""
+Read replicas
+
+With `REPLICA_DATABASES` set, `ReplicaRouter` sends the queries of GET and
+HEAD requests to one of those databases, chosen per request, and every
+other query to "default". Queries outside requests (commands, shells) stay
+on "default".
+
+Replicas lag behind, so a client that writes is pinned to "default" for
+`REPLICA_PIN_SECONDS` through a cookie, and reads its own writes; within a
+request, the queries after a write are pinned as well.
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = "db_pinned"
+SAFE_METHODS = ("GET", "HEAD")
+
+
+class Routing:
+    """Where the queries of one request go"""
+
+    def __init__(self, replica):
+        # None when pinned to "default"
+        self.replica = replica
+        self.wrote = False
+
+
+# Routing of the request being handled, None outside requests
+current = ContextVar("replica_routing", default=None)
+
+
+def get_routing(request):
+    replicas = settings.REPLICA_DATABASES
+    if (
+        not replicas
+        or request.method not in SAFE_METHODS
+        or PIN_COOKIE in request.COOKIES
+    ):
+        return Routing(None)
+    return Routing(random.choice(replicas))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = current.get()
+        if routing is None:
+            return None
+        return routing.replica or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = current.get()
+        if routing is not None:
+            routing.replica = None
+            routing.wrote = True
+        # Also for instances read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """Routes the queries of each request; keep it before any that query"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        routing = get_routing(request)
+        token = current.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.pin(response, routing)
+
+    async def __acall__(self, request):
+        routing = get_routing(request)
+        token = current.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.pin(response, routing)
+
+    def pin(self, response, routing):
+        if routing.wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                secure=not settings.DEBUG,
+                samesite="None" if not settings.DEBUG else "Lax",
+            )
+        return response
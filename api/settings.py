@@ -55,8 +55,10 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "authentication.User"
 
 MIDDLEWARE = [
+    "api.metrics.InstrumentationMiddleware",
+    "api.replicas.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "api.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -89,14 +91,99 @@ WSGI_APPLICATION = "api.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# Set USE_SQLITE to run locally (and run the tests) without PostgreSQL
+USE_SQLITE = config("USE_SQLITE", default=False, cast=bool)
+
+if USE_SQLITE:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        },
+        # Stands in for a read replica in tests; nothing copies data to it
+        "replica": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "replica.sqlite3",
+        },
+    }
+    REPLICA_DATABASES = []
+else:
+    # Every worker process keeps a pool of connections (psycopg 3's pool),
+    # checked with a round trip when checked out. Keep the number of workers
+    # times DB_POOL_MAX_SIZE below the server's `max_connections`. Without
+    # the pool, connections persist for DB_CONN_MAX_AGE seconds instead.
+    DB_POOL = config("DB_POOL", default=True, cast=bool)
+    DB_POOL_OPTIONS = {
+        "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+        # One connection per request thread (see the Procfile)
+        "max_size": config("DB_POOL_MAX_SIZE", default=4, cast=int),
+        # Seconds a request waits for a connection before failing
+        "timeout": config("DB_POOL_TIMEOUT", default=10.0, cast=float),
+        # Seconds before a connection is replaced, and before an idle one
+        # above `min_size` is closed
+        "max_lifetime": config(
+            "DB_POOL_MAX_LIFETIME", default=3600.0, cast=float
+        ),
+        "max_idle": config("DB_POOL_MAX_IDLE", default=600.0, cast=float),
+    }
+
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": config("PG_DATABASE_NAME"),
+            "USER": config("PG_DATABASE_USER"),
+            "PASSWORD": config("PG_DATABASE_PASSWORD"),
+            "HOST": config("PG_DATABASE_HOST"),
+            "PORT": config("PG_DATABASE_PORT"),
+            # Pooled connections are returned at the end of each request
+            "CONN_MAX_AGE": (
+                0
+                if DB_POOL
+                else config("DB_CONN_MAX_AGE", default=60, cast=int)
+            ),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"pool": DB_POOL_OPTIONS} if DB_POOL else {},
+        }
+    }
+
+    # Read replicas of "default", as comma-separated hosts sharing its
+    # database, credentials and pool settings
+    REPLICA_DATABASES = []
+    for index, host in enumerate(
+        config("PG_REPLICA_HOSTS", default="", cast=Csv())
+    ):
+        alias = f"replica{index}"
+        DATABASES[alias] = {
+            **DATABASES["default"],
+            "HOST": host,
+            "TEST": {"MIRROR": "default"},
+        }
+        REPLICA_DATABASES.append(alias)
+
+# Send the reads of GET and HEAD requests to REPLICA_DATABASES, and keep a
+# client that writes on "default" for this many seconds (see api/replicas.py)
+DATABASE_ROUTERS = ["api.replicas.ReplicaRouter"]
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=5, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Counters and invalidation markers live here, so production should point
+# this at a cache shared by all workers. The default per-process LocMemCache
+# cannot tell a worker about the others' writes, so with it every
+# authenticated request reads the user's claims marker from the database
+# and every token refresh queries the blacklist.
+# For Redis (the client is in requirements.txt):
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CACHE_LOCATION=redis://localhost:6379/0
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": config("PG_DATABASE_NAME"),
-        "USER": config("PG_DATABASE_USER"),
-        "PASSWORD": config("PG_DATABASE_PASSWORD"),
-        "HOST": config("PG_DATABASE_HOST"),
-        "PORT": config("PG_DATABASE_PORT"),
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
     }
 }
 
@@ -147,12 +234,100 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.authentication.backends.ClaimsJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.metrics.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ),
 }
 
+# How long paginated article totals are cached, in seconds. Writes only
+# invalidate the totals cached by their own worker unless CACHE_BACKEND is
+# shared, so with a per-process cache the shorter local timeout applies
+ARTICLE_COUNT_CACHE_TIMEOUT = config(
+    "ARTICLE_COUNT_CACHE_TIMEOUT", default=300, cast=int
+)
+ARTICLE_COUNT_LOCAL_CACHE_TIMEOUT = config(
+    "ARTICLE_COUNT_LOCAL_CACHE_TIMEOUT", default=5, cast=int
+)
+# Above this many planner-estimated rows the estimate is served instead of
+# an exact count (PostgreSQL only)
+ARTICLE_COUNT_ESTIMATE_THRESHOLD = config(
+    "ARTICLE_COUNT_ESTIMATE_THRESHOLD", default=100_000, cast=int
+)
+
+# How long the viewer-independent part of a serialized article is cached, in
+# seconds; entries are keyed by version so this only bounds memory use
+ARTICLE_FRAGMENT_CACHE_TIMEOUT = config(
+    "ARTICLE_FRAGMENT_CACHE_TIMEOUT", default=3600, cast=int
+)
+
+# How long a worker serves the cached tag cloud, in seconds. Writes drop it
+# from the cache they reach at once; with a per-process cache the other
+# workers catch up when it expires
+TAG_CLOUD_CACHE_TIMEOUT = config(
+    "TAG_CLOUD_CACHE_TIMEOUT", default=30, cast=int
+)
+
+# Serve `/api/articles/feed/` from the materialized feed table; when off the
+# feed is computed from follows on every request (the table is still kept)
+FEED_MATERIALIZED = config("FEED_MATERIALIZED", default=True, cast=bool)
+
+# Page every comment listing by cursor. Off by default, as existing clients
+# expect every comment in one response; clients opt in with `?cursor=` or
+# `?limit=`
+COMMENTS_PAGINATED = config("COMMENTS_PAGINATED", default=False, cast=bool)
+
+# Share of requests measured by `api.metrics.InstrumentationMiddleware`,
+# from 0 (off) to 1 (every request)
+METRICS_SAMPLE_RATE = config("METRICS_SAMPLE_RATE", default=1.0, cast=float)
+# Bearer token a scraper must send to read `/api/metrics`; when empty the
+# endpoint is not served
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Keep the full user and profile of authenticated requests in process memory
+# for this many seconds; 0 builds them from the token claims alone
+AUTH_USER_CACHE_TIMEOUT = config(
+    "AUTH_USER_CACHE_TIMEOUT", default=0, cast=int
+)
+
+# Password hashes run at once per worker during login and register, hashes
+# allowed to wait for one (more are refused with 429), and seconds a hash may
+# wait before it is dropped with 503. Under WSGI every running or waiting hash
+# holds a request thread, so keep concurrency + queue below the threads per
+# worker in the Procfile (4), leaving one for everything else
+AUTH_HASH_CONCURRENCY = config("AUTH_HASH_CONCURRENCY", default=1, cast=int)
+AUTH_HASH_QUEUE_SIZE = config("AUTH_HASH_QUEUE_SIZE", default=2, cast=int)
+AUTH_HASH_QUEUE_TIMEOUT = config(
+    "AUTH_HASH_QUEUE_TIMEOUT", default=2.0, cast=float
+)
+
+# Check refresh tokens against a per-worker bloom filter of the blacklist,
+# querying only on a hit, and reload it at least this often, in seconds.
+# Only used with a shared CACHE_BACKEND, which tells every worker of tokens
+# blacklisted by the others; with the default per-process cache every
+# refresh queries the blacklist
+TOKEN_BLACKLIST_FILTER = config(
+    "TOKEN_BLACKLIST_FILTER", default=True, cast=bool
+)
+TOKEN_BLACKLIST_REFRESH_INTERVAL = config(
+    "TOKEN_BLACKLIST_REFRESH_INTERVAL", default=60, cast=int
+)
+
+# Serve GET and HEAD requests of the article, tag, profile and comment reads
+# from their async handlers (see api/asyncviews.py); for ASGI servers only
+ASYNC_READ_VIEWS = config("ASYNC_READ_VIEWS", default=False, cast=bool)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
+    # Issue tokens that carry the claims read by `ClaimsJWTAuthentication`
+    "TOKEN_OBTAIN_SERIALIZER": (
+        "apps.authentication.serializers.ClaimsTokenObtainPairSerializer"
+    ),
+    "TOKEN_REFRESH_SERIALIZER": (
+        "apps.authentication.serializers.ClaimsTokenRefreshSerializer"
+    ),
 }
 
 CORS_ALLOW_CREDENTIALS = True
@@ -15,6 +15,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
@@ -23,8 +24,12 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
+from .asyncviews import async_read_urls
+from .metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/metrics", metrics_view, name="metrics"),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path(
         "api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"
@@ -34,3 +39,6 @@ urlpatterns = [
     path("api/", include("apps.articles.urls")),
     path("api/", include("apps.comments.urls")),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_read_urls(urlpatterns)
@@ -25,16 +25,6 @@ class ArticleAdmin(admin.ModelAdmin):
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ("name", "get_article_count",)
+    list_display = ("name", "articles_count",)
     search_fields = ("name",)
     ordering = ("name",)
-
-    def get_article_count(self, obj):
-        """Display the number of articles associated with this tag"""
-        return obj.articles.count()
-
-    get_article_count.short_description = "Article Count"
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.prefetch_related("articles")
@@ -0,0 +1,36 @@
+import hashlib
+import json
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+# Helpers for answering conditional GETs (If-None-Match / If-Modified-Since)
+# from cheap change markers, before anything is serialized.
+
+
+def make_etag(*parts):
+    """Return a quoted ETag digesting the JSON-serializable `parts`"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return quote_etag(hashlib.md5(payload.encode()).hexdigest())
+
+
+def get_not_modified_response(request, etag, last_modified=None):
+    """Return a 304 response if the client's copy is current, else None"""
+    # HTTP dates have whole-second precision
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    if get_conditional_response(request, etag, timestamp) is None:
+        return None
+
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    return set_validators(response, etag, last_modified)
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # Responses depend on who is asking (favorited, following)
+    patch_vary_headers(response, ["Authorization"])
+    return response
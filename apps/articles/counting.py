@@ -0,0 +1,139 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from ..authentication.tokens import cache_is_shared
+
+# Paginated article totals are cached per filter combination ("scope").
+# Every cached total embeds the current value of the version markers its
+# scope depends on, so bumping a marker invalidates exactly those entries:
+#   - "articles": any article created, deleted or retagged
+#   - "favorited:<username>": that user favorited or unfavorited something
+#   - "feed:<profile id>": that profile followed or unfollowed someone
+#   - "search": any article edited, for totals of search results
+# A per-process cache only sees the markers bumped by its own worker, so
+# there totals are kept for `ARTICLE_COUNT_LOCAL_CACHE_TIMEOUT` instead.
+
+VERSION_PREFIX = "article-count:version:"
+COUNT_PREFIX = "article-count:"
+
+
+def bump_versions(*names):
+    """Invalidate every cached total that depends on the given markers"""
+    now = time.time_ns()
+    cache.set_many({VERSION_PREFIX + name: now for name in names}, None)
+
+
+def get_versions(names):
+    keys = [VERSION_PREFIX + name for name in names]
+    versions = cache.get_many(keys)
+
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+
+    return [versions[key] for key in keys]
+
+
+def get_scope_versions(scope):
+    names = ["articles"]
+    if scope.get("favorited"):
+        names.append(f"favorited:{scope['favorited']}")
+    if scope.get("feed"):
+        names.append(f"feed:{scope['feed']}")
+    if scope.get("q"):
+        names.append("search")
+    return get_versions(names)
+
+
+def get_plan(explained):
+    """Return the top node of PostgreSQL's `explain(format="json")` output"""
+    plan = json.loads(explained)
+    # Depending on the driver, Django returns the `[{"Plan": ...}]` list
+    # EXPLAIN prints or the single object in it
+    if isinstance(plan, list):
+        (plan,) = plan
+    return plan["Plan"]
+
+
+def estimate_count(queryset):
+    """Return the planner's row estimate, or None if it is not available"""
+    if not can_estimate(queryset):
+        return None
+    plan = queryset.order_by().values("pk").explain(format="json")
+    return int(get_plan(plan)["Plan Rows"])
+
+
+async def aestimate_count(queryset):
+    if not can_estimate(queryset):
+        return None
+    plan = await queryset.order_by().values("pk").aexplain(format="json")
+    return int(get_plan(plan)["Plan Rows"])
+
+
+def can_estimate(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def get_count_key(scope):
+    payload = json.dumps([scope, get_scope_versions(scope)], sort_keys=True)
+    return COUNT_PREFIX + hashlib.md5(payload.encode()).hexdigest()
+
+
+def get_count_timeout():
+    if cache_is_shared():
+        return settings.ARTICLE_COUNT_CACHE_TIMEOUT
+    return settings.ARTICLE_COUNT_LOCAL_CACHE_TIMEOUT
+
+
+def is_estimate_used(estimate):
+    return (
+        estimate is not None
+        and estimate > settings.ARTICLE_COUNT_ESTIMATE_THRESHOLD
+    )
+
+
+def get_count(queryset, scope):
+    """
+    Return `(count, approximate)` for `queryset`, filtered as described by
+    `scope`
+
+    Exact totals are cached until a write touches the scope. When the
+    planner expects more than `ARTICLE_COUNT_ESTIMATE_THRESHOLD` rows its
+    estimate is returned instead and flagged as approximate.
+    """
+    key = get_count_key(scope)
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    estimate = estimate_count(queryset)
+    if is_estimate_used(estimate):
+        result = (estimate, True)
+    else:
+        result = (queryset.count(), False)
+
+    cache.set(key, result, get_count_timeout())
+    return result
+
+
+async def aget_count(queryset, scope):
+    """`get_count` on the async ORM"""
+    key = get_count_key(scope)
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    estimate = await aestimate_count(queryset)
+    if is_estimate_used(estimate):
+        result = (estimate, True)
+    else:
+        result = (await queryset.acount(), False)
+
+    cache.set(key, result, get_count_timeout())
+    return result
@@ -0,0 +1,176 @@
+import random
+from io import StringIO
+from itertools import accumulate, islice
+
+from django.core.management import call_command
+from django.db import connection
+
+from . import feed
+from .models import Article, Tag
+from ..authentication.models import User
+from ..comments.models import Comment
+from ..users.models import Profile
+
+# Bulk-seeded data for query plan checks and benchmarks. Rows are written
+# with `bulk_create` in batches, so `Article.save`, the profile signal and
+# the counter handlers do not run; the feeds are rebuilt and the counters
+# reconciled at the end.
+#
+# Popularity follows a power law: a few profiles write most articles, a few
+# gather most followers, a few articles get most favorites and comments, and
+# a few tags are on most articles.
+
+BATCH_SIZE = 1000
+
+
+def insert(model, rows):
+    """Insert `rows` in batches and return their pks, in order"""
+    pks = []
+    rows = iter(rows)
+    while batch := list(islice(rows, BATCH_SIZE)):
+        pks.extend(obj.pk for obj in model.objects.bulk_create(batch))
+    return pks
+
+
+class PowerLaw:
+    """Picks items so that the item at rank r weighs 1 / r ** exponent"""
+
+    def __init__(self, items, exponent, rng):
+        self.items = items
+        self.cum_weights = list(
+            accumulate(1 / rank**exponent for rank in range(1, len(items) + 1))
+        )
+        self.rng = rng
+
+    def choices(self, k):
+        """Return `k` items, with repeats"""
+        if not self.items:
+            return []
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+    def sample(self, k):
+        """Return up to `k` distinct items"""
+        return set(self.choices(k))
+
+
+def seed(
+    users=500,
+    articles=5000,
+    tags=50,
+    tags_per_article=3,
+    favorites_per_user=40,
+    follows_per_user=10,
+    comments_per_article=2,
+    exponent=1.0,
+    prefix="seed",
+    random_seed=0,
+    build_feeds=True,
+):
+    """
+    Insert a dataset of the given size, refresh planner statistics and
+    return the number of rows written per table
+    """
+    rng = random.Random(random_seed)
+
+    user_ids = insert(
+        User,
+        (
+            # "!" is an unusable password, so nothing is hashed
+            User(
+                email=f"{prefix}{i}@example.com",
+                username=f"{prefix}{i}",
+                password="!",
+            )
+            for i in range(users)
+        ),
+    )
+    profile_ids = insert(Profile, (Profile(user_id=pk) for pk in user_ids))
+    # Being followed and writing a lot are ranked independently; otherwise
+    # the most followed authors would fill every feed
+    followed_profiles = PowerLaw(profile_ids, exponent, rng)
+    writing_profiles = PowerLaw(
+        rng.sample(profile_ids, len(profile_ids)), exponent, rng
+    )
+
+    tag_ids = insert(Tag, (Tag(name=f"{prefix}-tag-{i}") for i in range(tags)))
+    popular_tags = PowerLaw(tag_ids, exponent, rng)
+
+    # Unique slugs up front skip the slug allocation of `Article.save`
+    article_ids = insert(
+        Article,
+        (
+            Article(
+                slug=f"{prefix}-article-{i}",
+                title=f"Seed article {i}",
+                description=f"Description of seed article {i}",
+                body=f"Body of seed article {i}",
+                author_id=author_id,
+            )
+            for i, author_id in enumerate(writing_profiles.choices(articles))
+        ),
+    )
+    popular_articles = PowerLaw(article_ids, exponent, rng)
+
+    tag_links = insert(
+        Article.tags.through,
+        (
+            Article.tags.through(article_id=article_id, tag_id=tag_id)
+            for article_id in article_ids
+            for tag_id in popular_tags.sample(tags_per_article)
+        ),
+    )
+    follows = insert(
+        Profile.followers.through,
+        (
+            Profile.followers.through(
+                from_profile_id=author_id, to_profile_id=reader_id
+            )
+            for reader_id in profile_ids
+            for author_id in followed_profiles.sample(follows_per_user)
+            if author_id != reader_id
+        ),
+    )
+    favorites = insert(
+        Article.favorited_by.through,
+        (
+            Article.favorited_by.through(profile_id=profile_id, article_id=pk)
+            for profile_id in profile_ids
+            for pk in popular_articles.sample(favorites_per_user)
+        ),
+    )
+    comment_ids = insert(
+        Comment,
+        (
+            Comment(
+                article_id=article_id,
+                author_id=rng.choice(profile_ids),
+                body=f"Comment {i} on seed article {article_id}",
+            )
+            for i, article_id in enumerate(
+                popular_articles.choices(
+                    len(article_ids) * comments_per_article
+                )
+            )
+        ),
+    )
+
+    if build_feeds:
+        feed.rebuild(profile_ids)
+    call_command("reconcile_counters", "--fix", stdout=StringIO())
+    analyze()
+
+    return {
+        "users": len(user_ids),
+        "articles": len(article_ids),
+        "tags": len(tag_ids),
+        "article_tags": len(tag_links),
+        "follows": len(follows),
+        "favorites": len(favorites),
+        "comments": len(comment_ids),
+    }
+
+
+def analyze():
+    """Refresh the planner statistics after a bulk load"""
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
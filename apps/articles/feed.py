@@ -0,0 +1,76 @@
+from itertools import islice
+
+from .models import Article, FeedEntry
+from ..users.models import Profile
+
+# The materialized feed holds one FeedEntry per (reader, article) for every
+# article written by someone the reader follows. These helpers keep it in
+# step with articles and follows; they are called from signals.py.
+
+BATCH_SIZE = 1000
+
+
+def insert_entries(entries):
+    entries = iter(entries)
+    while batch := list(islice(entries, BATCH_SIZE)):
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(article):
+    """Push a new article into the feed of every follower of its author"""
+    follower_ids = Profile.followers.through.objects.filter(
+        from_profile_id=article.author_id
+    ).values_list("to_profile_id", flat=True)
+
+    insert_entries(
+        FeedEntry(
+            reader_id=reader_id,
+            article_id=article.pk,
+            created_at=article.created_at,
+        )
+        for reader_id in follower_ids.iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def add_follows(reader_ids, author_ids):
+    """Backfill the feeds of `reader_ids` with the articles of `author_ids`"""
+    articles = list(
+        Article.objects.filter(author_id__in=author_ids).values_list(
+            "pk", "created_at"
+        )
+    )
+
+    insert_entries(
+        FeedEntry(reader_id=reader_id, article_id=pk, created_at=created_at)
+        for reader_id in reader_ids
+        for pk, created_at in articles
+    )
+
+
+def remove_follows(reader_ids, author_ids):
+    """Drop the articles of `author_ids` from the feeds of `reader_ids`"""
+    FeedEntry.objects.filter(
+        reader_id__in=reader_ids, article__author_id__in=author_ids
+    ).delete()
+
+
+def rebuild(reader_ids=None):
+    """Recreate the feeds of `reader_ids` (all readers by default)"""
+    follows = Profile.followers.through.objects.all()
+    entries = FeedEntry.objects.all()
+    if reader_ids is not None:
+        follows = follows.filter(to_profile_id__in=reader_ids)
+        entries = entries.filter(reader_id__in=reader_ids)
+
+    entries.delete()
+
+    author_ids_by_reader = {}
+    for author_id, reader_id in follows.values_list(
+        "from_profile_id", "to_profile_id"
+    ).iterator(chunk_size=BATCH_SIZE):
+        author_ids_by_reader.setdefault(reader_id, []).append(author_id)
+
+    for reader_id, author_ids in author_ids_by_reader.items():
+        add_follows([reader_id], author_ids)
+
+    return len(author_ids_by_reader)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from ... import feed
+from ...models import FeedEntry
+from ....users.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized article feeds from the follow graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames",
+            nargs="*",
+            help="Only rebuild the feeds of these users (default: everyone)",
+        )
+
+    def handle(self, *args, **options):
+        reader_ids = None
+        if options["usernames"]:
+            reader_ids = list(
+                Profile.objects.filter(
+                    user__username__in=options["usernames"]
+                ).values_list("pk", flat=True)
+            )
+
+        readers = feed.rebuild(reader_ids)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {readers} feeds "
+                f"({FeedEntry.objects.count()} entries in total)"
+            )
+        )
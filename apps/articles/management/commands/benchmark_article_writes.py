@@ -0,0 +1,82 @@
+import json
+import time
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from ...serializers import ArticleSerializer
+from ....authentication.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time article creates and tag updates through ArticleSerializer. "
+        "Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=50)
+        parser.add_argument("--tags", type=int, default=10)
+
+    def measure(self, save):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result = save()
+            elapsed = time.perf_counter() - start
+        return result, elapsed * 1000, len(queries)
+
+    def handle(self, *args, **options):
+        results = {"create": [], "update": []}
+
+        with transaction.atomic():
+            author = User.objects.create_user(
+                email="benchmark@example.com",
+                username="benchmark",
+                password=None,
+            ).profile
+
+            for i in range(options["articles"]):
+                tags = [f"bench-{i}-{t}" for t in range(options["tags"])]
+                serializer = ArticleSerializer(
+                    data={
+                        "title": f"Benchmark article {i}",
+                        "description": "description",
+                        "body": "body",
+                        # Repeat the tags to exercise deduplication
+                        "tags": tags + tags[:2],
+                    }
+                )
+                serializer.is_valid(raise_exception=True)
+                article, ms, queries = self.measure(
+                    lambda: serializer.save(author=author)
+                )
+                results["create"].append((ms, queries))
+
+                # Keep half of the tags and swap in new ones for the rest
+                half = options["tags"] // 2
+                serializer = ArticleSerializer(
+                    article,
+                    data={
+                        "tags": tags[:half] + [f"{t}-new" for t in tags[half:]]
+                    },
+                    partial=True,
+                )
+                serializer.is_valid(raise_exception=True)
+                _, ms, queries = self.measure(serializer.save)
+                results["update"].append((ms, queries))
+
+            transaction.set_rollback(True)
+
+        report = {
+            operation: {
+                "articles": len(samples),
+                "tags_per_article": options["tags"],
+                "p50_ms": round(median(ms for ms, _ in samples), 3),
+                "max_ms": round(max(ms for ms, _ in samples), 3),
+                "queries_per_article": max(q for _, q in samples),
+            }
+            for operation, samples in results.items()
+        }
+        self.stdout.write(json.dumps(report, indent=2))
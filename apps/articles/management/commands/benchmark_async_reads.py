@@ -0,0 +1,235 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from api import urls as api_urls
+from api.asyncviews import async_read_urls
+
+from .benchmark_endpoints import percentile
+from ...plans import get_sample
+from ....authentication.tokens import RefreshToken
+
+# The API with the async read views swapped in, as with ASYNC_READ_VIEWS on
+urlpatterns = async_read_urls(api_urls.urlpatterns)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the read endpoints under concurrent slow clients, served by "
+        "threads as WSGI workers would and by one ASGI event loop with the "
+        "sync and the async views, and print the results as JSON. Needs a "
+        "database that other threads can see, not the test one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seconds", type=float, default=10, help="Duration of each run"
+        )
+        parser.add_argument(
+            "--clients", type=int, default=50, help="Concurrent clients"
+        )
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=0.5,
+            help="Seconds a client takes to send its request, and again to "
+            "read the response",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=3,
+            help="WSGI worker processes, as in the Procfile",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="Threads per WSGI worker, as in the Procfile",
+        )
+
+    def get_paths(self):
+        """Return `[(path, authenticated)]`, requested in turn by clients"""
+        sample = get_sample()
+        article, profile = sample["article"], sample["profile"]
+        if article is None or profile is None:
+            raise CommandError("No data to benchmark, run seed_dataset first")
+
+        self.viewer = profile.user
+        return [
+            ("/api/articles/", False),
+            ("/api/articles/?cursor=", False),
+            (f"/api/articles/{article.slug}/", False),
+            ("/api/articles/feed/", True),
+            (f"/api/articles/{article.slug}/comments/", False),
+            ("/api/tags/", False),
+            (f"/api/profiles/{article.author.user.username}/", False),
+        ]
+
+    def report(self, timings, elapsed):
+        return {
+            "requests": len(timings),
+            "per_second": round(len(timings) / elapsed, 1),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+        }
+
+    def run_wsgi(self):
+        """
+        A WSGI worker thread reads the request and writes the response
+        itself, so a slow client holds it for the whole exchange
+        """
+        options = self.options
+        deadline = time.monotonic() + options["seconds"]
+        slots = threading.BoundedSemaphore(
+            options["workers"] * options["threads"]
+        )
+        timings, errors = [], []
+        lock = threading.Lock()
+
+        def run_client(offset):
+            client = Client()
+            index = offset
+            try:
+                while time.monotonic() < deadline:
+                    path, authenticated = self.paths[index % len(self.paths)]
+                    index += 1
+                    start = time.perf_counter()
+                    with slots:
+                        time.sleep(options["delay"])
+                        response = client.get(
+                            path, **(self.headers if authenticated else {})
+                        )
+                        time.sleep(options["delay"])
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f"{path} answered {response.status_code}"
+                        )
+                    with lock:
+                        timings.append((time.perf_counter() - start) * 1000)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=run_client, args=(offset,))
+            for offset in range(options["clients"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise CommandError(f"A client failed: {errors[0]!r}")
+        return self.report(timings, time.perf_counter() - start)
+
+    async def request_asgi(self, application, path, authenticated):
+        """Request `path` from `application` as a slow client would"""
+        delay = self.options["delay"]
+        path, _, query = path.partition("?")
+        headers = [(b"host", b"testserver")]
+        if authenticated:
+            authorization = self.headers["HTTP_AUTHORIZATION"]
+            headers.append((b"authorization", authorization.encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        received, status = False, None
+        done = asyncio.Event()
+
+        async def receive():
+            nonlocal received
+            if received:
+                # Django listens for a disconnect until it has answered
+                await done.wait()
+                return {"type": "http.disconnect"}
+            received = True
+            await asyncio.sleep(delay)
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif not message.get("more_body"):
+                await asyncio.sleep(delay)
+                done.set()
+
+        await application(scope, receive, send)
+        if status != 200:
+            raise CommandError(f"{path} answered {status}")
+
+    async def run_asgi_clients(self):
+        options = self.options
+        application = ASGIHandler()
+        deadline = time.monotonic() + options["seconds"]
+        timings = []
+
+        async def run_client(offset):
+            index = offset
+            while time.monotonic() < deadline:
+                path, authenticated = self.paths[index % len(self.paths)]
+                index += 1
+                start = time.perf_counter()
+                await self.request_asgi(application, path, authenticated)
+                timings.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(run_client(offset) for offset in range(options["clients"]))
+        )
+        return self.report(timings, time.perf_counter() - start)
+
+    def run_asgi(self, **overrides):
+        """One event loop, as a single-process ASGI server would run"""
+        with override_settings(**overrides):
+            try:
+                return asyncio.run(self.run_asgi_clients())
+            finally:
+                connection.close()
+
+    def handle(self, *args, **options):
+        self.options = options
+        if connection.settings_dict["NAME"] == ":memory:":
+            raise CommandError("An in-memory database is not shared")
+
+        self.paths = self.get_paths()
+        token = RefreshToken.for_user(self.viewer).access_token
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+        connection.close()
+
+        # The test client identifies itself as "testserver"
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ):
+            report = {
+                "database": connection.vendor,
+                "clients": options["clients"],
+                "delay_seconds": options["delay"],
+                "modes": {
+                    "wsgi": self.run_wsgi(),
+                    "asgi-sync-views": self.run_asgi(),
+                    "asgi-async-views": self.run_asgi(ROOT_URLCONF=__name__),
+                },
+            }
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,131 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+
+from .benchmark_endpoints import percentile
+from ...plans import get_sample
+
+# Used when the settings configure no pool, e.g. with DB_POOL off
+DEFAULT_POOL_OPTIONS = {"min_size": 1, "max_size": 4}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time article requests with a new database connection per request, "
+        "with persistent connections and with the connection pool "
+        "(PostgreSQL only), and print the results as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Timed requests per mode and endpoint",
+        )
+
+    def configure(self, conn_max_age, pool):
+        """Reconnect the default database with these connection settings"""
+        connection.close()
+        if getattr(connection, "pool", None):
+            connection.close_pool()
+
+        options = {
+            key: value
+            for key, value in self.settings_dict["OPTIONS"].items()
+            if key != "pool"
+        }
+        if pool:
+            options["pool"] = pool
+        connection.settings_dict.update(
+            CONN_MAX_AGE=conn_max_age, CONN_HEALTH_CHECKS=True, OPTIONS=options
+        )
+
+    def request(self, path):
+        # The test client leaves connections alone, so close them as the
+        # request signals would: before, for the health check, and after
+        close_old_connections()
+        start = time.perf_counter()
+        response = self.client.get(path)
+        elapsed = (time.perf_counter() - start) * 1000
+        close_old_connections()
+        if response.status_code != 200:
+            raise CommandError(f"{path} answered {response.status_code}")
+        return elapsed
+
+    def measure(self, conn_max_age, pool=None):
+        self.configure(conn_max_age, pool)
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count)
+        try:
+            # Not timed: opens the pool or the persistent connection
+            self.request(self.paths[0])
+            opened.clear()
+
+            report = {}
+            for path in self.paths:
+                timings = [
+                    self.request(path) for _ in range(self.options["requests"])
+                ]
+                report[path] = {
+                    "requests": len(timings),
+                    "p50_ms": round(percentile(timings, 50), 3),
+                    "p99_ms": round(percentile(timings, 99), 3),
+                }
+            report["connections_opened"] = len(opened)
+            if pool:
+                report["pool"] = connection.pool.get_stats()
+            return report
+        finally:
+            connection_created.disconnect(count)
+
+    def handle(self, *args, **options):
+        self.options = options
+        if connection.settings_dict["NAME"] == ":memory:":
+            raise CommandError(
+                "An in-memory database does not outlive a connection"
+            )
+
+        article = get_sample()["article"]
+        if article is None:
+            raise CommandError("No data to benchmark, run seed_dataset first")
+        self.paths = ["/api/articles/", f"/api/articles/{article.slug}/"]
+        self.client = Client()
+
+        self.settings_dict = dict(connection.settings_dict)
+        try:
+            # The test client identifies itself as "testserver"
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+            ):
+                modes = {
+                    "per-request": self.measure(0),
+                    "persistent": self.measure(None),
+                }
+                if connection.vendor == "postgresql":
+                    pool = self.settings_dict["OPTIONS"].get("pool")
+                    modes["pool"] = self.measure(
+                        0,
+                        (
+                            pool
+                            if isinstance(pool, dict)
+                            else DEFAULT_POOL_OPTIONS
+                        ),
+                    )
+        finally:
+            connection.close()
+            if getattr(connection, "pool", None):
+                connection.close_pool()
+            connection.settings_dict.update(self.settings_dict)
+
+        report = {"database": connection.vendor, "modes": modes}
+        self.stdout.write(json.dumps(report, indent=2))
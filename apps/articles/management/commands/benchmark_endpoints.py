@@ -0,0 +1,166 @@
+import json
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ...plans import get_sample
+from ....authentication.tokens import RefreshToken
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of `samples`"""
+    ordered = sorted(samples)
+    return ordered[max(0, round(q / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every API endpoint in-process against the current database "
+        "and print p50/p99 latency, query count and peak memory as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=50,
+            help="Timed requests per endpoint",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=5,
+            help="Untimed requests per endpoint, e.g. to fill caches",
+        )
+        parser.add_argument(
+            "--output", help="Also write the report to this file"
+        )
+
+    def get_endpoints(self):
+        """
+        Return `{name: (method, path, authenticated, undo)}`, where `undo`
+        is the method that reverts a write before it is repeated
+        """
+        sample = get_sample()
+        article, profile, tag = (
+            sample["article"],
+            sample["profile"],
+            sample["tag"],
+        )
+        if article is None or profile is None:
+            raise CommandError("No data to benchmark, run seed_dataset first")
+
+        self.viewer = profile.user
+        slug, username = article.slug, profile.user.username
+        return {
+            "article-list": ("get", "/api/articles/", False, None),
+            "article-list-tag": (
+                "get",
+                f"/api/articles/?tag={tag.name}",
+                False,
+                None,
+            ),
+            "article-list-author": (
+                "get",
+                f"/api/articles/?author={article.author.user.username}",
+                False,
+                None,
+            ),
+            "article-list-authenticated": ("get", "/api/articles/", True, None),
+            "article-feed": ("get", "/api/articles/feed/", True, None),
+            "article-detail": ("get", f"/api/articles/{slug}/", True, None),
+            "article-favorite": (
+                "post",
+                f"/api/articles/{slug}/favorite/",
+                True,
+                "delete",
+            ),
+            "article-unfavorite": (
+                "delete",
+                f"/api/articles/{slug}/favorite/",
+                True,
+                "post",
+            ),
+            "comment-list": (
+                "get",
+                f"/api/articles/{slug}/comments/",
+                True,
+                None,
+            ),
+            "tag-list": ("get", "/api/tags/", False, None),
+            "profile-view": ("get", f"/api/profiles/{username}/", True, None),
+        }
+
+    def request(self, method, path, authenticated):
+        headers = self.auth_headers if authenticated else {}
+        response = getattr(self.client, method)(path, **headers)
+        if response.status_code >= 400:
+            raise CommandError(
+                f"{method.upper()} {path} answered {response.status_code}"
+            )
+        return response
+
+    def measure(self, endpoint):
+        method, path, authenticated, undo = endpoint
+
+        def run():
+            if undo:
+                self.request(undo, path, authenticated)
+            start = time.perf_counter()
+            self.request(method, path, authenticated)
+            return (time.perf_counter() - start) * 1000
+
+        for _ in range(self.options["warmup"]):
+            run()
+        timings = [run() for _ in range(self.options["requests"])]
+
+        # Queries and memory are measured on one more request, as tracing
+        # would distort the timings
+        if undo:
+            self.request(undo, path, authenticated)
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                self.request(method, path, authenticated)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "requests": len(timings),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "queries": len(queries),
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.client = Client()
+
+        # The test client identifies itself as "testserver"
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ):
+            endpoints = self.get_endpoints()
+            token = RefreshToken.for_user(self.viewer).access_token
+            self.auth_headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+            report = {
+                "database": connection.vendor,
+                "endpoints": {
+                    name: self.measure(endpoint)
+                    for name, endpoint in endpoints.items()
+                },
+            }
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
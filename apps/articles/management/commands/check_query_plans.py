@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ... import dataset, plans
+
+
+class Command(BaseCommand):
+    help = (
+        "Explain the queryset behind every API endpoint and report sequential "
+        "scans, avoidable sorts and cost regressions against the baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            action="store_true",
+            help=(
+                "Seed a dataset first, in a transaction that is rolled back "
+                "afterwards"
+            ),
+        )
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Store the current plan costs as the new baseline",
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+
+        with transaction.atomic():
+            if options["seed"]:
+                dataset.seed(**plans.DATASET)
+
+            costs, problems = plans.check(
+                plans.get_querysets(plans.get_sample()),
+                plans.load_baseline(vendor),
+            )
+            transaction.set_rollback(options["seed"])
+
+        for name, cost in sorted(costs.items()):
+            self.stdout.write(f"{name}: cost {cost:.2f}")
+
+        if options["update_baseline"]:
+            if not costs:
+                raise CommandError(f"{vendor} does not report plan costs")
+            plans.save_baseline(vendor, costs)
+            self.stdout.write(
+                self.style.SUCCESS(f"Baseline updated for {vendor}")
+            )
+            return
+
+        if problems:
+            raise CommandError("\n".join(problems))
+        self.stdout.write(self.style.SUCCESS("All query plans look fine"))
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.utils import timezone
+
+from ...models import Article, Tag
+from ....users.models import Profile
+
+
+# (model, counter field, relation it counts, change marker or None). The
+# marker is moved with a repaired counter so that cached fragments and ETags
+# keyed on it are refreshed.
+COUNTERS = [
+    (Article, "favorites_count", "favorited_by", "changed_at"),
+    (Article, "comments_count", "comments", "changed_at"),
+    (Tag, "articles_count", "articles", None),
+    (Profile, "followers_count", "followers", "updated_at"),
+    (Profile, "following_count", "following", "updated_at"),
+]
+
+
+class Command(BaseCommand):
+    help = "Check denormalized counters against the rows they count"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Rewrite drifted counters instead of only reporting them",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of drifted rows repaired per UPDATE",
+        )
+
+    def handle(self, *args, **options):
+        for model, field, relation, marker in COUNTERS:
+            actual = (
+                model.objects.filter(pk=OuterRef("pk"))
+                .annotate(actual=Count(relation))
+                .values("actual")
+            )
+            drifted = list(
+                model.objects.annotate(actual=Subquery(actual))
+                .exclude(**{field: F("actual")})
+                .values_list("pk", field, "actual")
+            )
+
+            label = f"{model._meta.label}.{field}"
+            for pk, stored, expected in drifted:
+                self.stdout.write(
+                    f"{label} pk={pk}: stored {stored}, actual {expected}"
+                )
+
+            if options["fix"]:
+                pks = [pk for pk, _, _ in drifted]
+                changes = {field: Subquery(actual)}
+                if marker is not None:
+                    changes[marker] = timezone.now()
+                for start in range(0, len(pks), options["batch_size"]):
+                    batch = pks[start : start + options["batch_size"]]
+                    # Recount inside the UPDATE so concurrent writes are not lost
+                    model.objects.filter(pk__in=batch).update(**changes)
+
+            status = "repaired" if options["fix"] else "found"
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{label}: {len(drifted)} drifted rows {status}"
+                )
+            )
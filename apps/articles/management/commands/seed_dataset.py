@@ -0,0 +1,63 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ... import dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load a synthetic dataset of users, follows, articles, tags, "
+        "favorites and comments with power-law popularity"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--articles", type=int, default=10000)
+        parser.add_argument("--tags", type=int, default=100)
+        parser.add_argument("--tags-per-article", type=int, default=3)
+        parser.add_argument("--favorites-per-user", type=int, default=40)
+        parser.add_argument("--follows-per-user", type=int, default=20)
+        parser.add_argument("--comments-per-article", type=int, default=2)
+        parser.add_argument(
+            "--exponent",
+            type=float,
+            default=1.0,
+            help="Power-law exponent of popularity; 0 spreads it evenly",
+        )
+        parser.add_argument(
+            "--prefix",
+            default="seed",
+            help="Prefix of usernames, slugs and tag names, unique per run",
+        )
+        parser.add_argument("--random-seed", type=int, default=0)
+        parser.add_argument(
+            "--skip-feeds",
+            action="store_true",
+            help="Leave the materialized feeds to `backfill_feed`",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            rows = dataset.seed(
+                users=options["users"],
+                articles=options["articles"],
+                tags=options["tags"],
+                tags_per_article=options["tags_per_article"],
+                favorites_per_user=options["favorites_per_user"],
+                follows_per_user=options["follows_per_user"],
+                comments_per_article=options["comments_per_article"],
+                exponent=options["exponent"],
+                prefix=options["prefix"],
+                random_seed=options["random_seed"],
+                build_feeds=not options["skip_feeds"],
+            )
+
+        report = {
+            "rows": rows,
+            "seconds": round(time.perf_counter() - start, 1),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_favorites_count(apps, schema_editor):
+    Article = apps.get_model("articles", "Article")
+    counts = (
+        Article.objects.filter(pk=OuterRef("pk"))
+        .annotate(count=Count("favorited_by"))
+        .values("count")
+    )
+    Article.objects.update(favorites_count=Subquery(counts))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0006_remove_article_favorites_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="favorites_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_favorites_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0007_article_favorites_count"),
+        ("users", "0002_profile_followers"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="article_created_id_idx"
+            ),
+        ),
+    ]
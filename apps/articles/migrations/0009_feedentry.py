@@ -0,0 +1,80 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_feeds(apps, schema_editor):
+    Article = apps.get_model("articles", "Article")
+    FeedEntry = apps.get_model("articles", "FeedEntry")
+    Profile = apps.get_model("users", "Profile")
+
+    follows = Profile.followers.through.objects.values_list(
+        "from_profile_id", "to_profile_id"
+    )
+    for author_id, reader_id in follows.iterator():
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(reader_id=reader_id, article_id=pk, created_at=created_at)
+                for pk, created_at in Article.objects.filter(
+                    author_id=author_id
+                ).values_list("pk", "created_at")
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0008_article_created_id_idx"),
+        ("users", "0002_profile_followers"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_entries",
+                        to="articles.article",
+                    ),
+                ),
+                (
+                    "reader",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_entries",
+                        to="users.profile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["reader", "-created_at", "-article"],
+                        name="feed_reader_created_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("reader", "article"), name="unique_feed_entry"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_articles_count(apps, schema_editor):
+    Tag = apps.get_model("articles", "Tag")
+    counts = (
+        Tag.objects.filter(pk=OuterRef("pk"))
+        .annotate(count=Count("articles"))
+        .values("count")
+    )
+    Tag.objects.update(articles_count=Subquery(counts))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0009_feedentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tag",
+            name="articles_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["-articles_count", "name"], name="tag_popularity_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_articles_count, migrations.RunPython.noop),
+    ]
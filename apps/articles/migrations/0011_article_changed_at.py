@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_updated_at(apps, schema_editor):
+    Article = apps.get_model("articles", "Article")
+    Article.objects.update(changed_at=F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0010_tag_articles_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="changed_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+    ]
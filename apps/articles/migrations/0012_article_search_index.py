@@ -0,0 +1,108 @@
+from django.db import migrations
+
+# Full-text search index over article titles, descriptions and bodies,
+# queried by apps/articles/search.py.
+#
+# PostgreSQL: a stored generated `search_vector` tsvector column with a GIN
+# index, title matches weighing more than description matches, which weigh
+# more than body matches. SQLite: an external-content FTS5 table kept in
+# step by triggers.
+
+
+class RunSQLOn(migrations.RunSQL):
+    """`RunSQL` run only on databases of the given vendor"""
+
+    def __init__(self, vendor, *args, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+POSTGRESQL_FORWARDS = [
+    """
+    ALTER TABLE articles_article ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS article_search_idx
+    ON articles_article USING GIN (search_vector)
+    """,
+]
+
+POSTGRESQL_BACKWARDS = [
+    "DROP INDEX IF EXISTS article_search_idx",
+    "ALTER TABLE articles_article DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARDS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_article_fts USING fts5(
+        title, description, body,
+        content='articles_article', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS articles_article_fts_insert
+    AFTER INSERT ON articles_article
+    BEGIN
+        INSERT INTO articles_article_fts (rowid, title, description, body)
+        VALUES (new.id, new.title, new.description, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS articles_article_fts_delete
+    AFTER DELETE ON articles_article
+    BEGIN
+        INSERT INTO articles_article_fts
+            (articles_article_fts, rowid, title, description, body)
+        VALUES ('delete', old.id, old.title, old.description, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS articles_article_fts_update
+    AFTER UPDATE ON articles_article
+    BEGIN
+        INSERT INTO articles_article_fts
+            (articles_article_fts, rowid, title, description, body)
+        VALUES ('delete', old.id, old.title, old.description, old.body);
+        INSERT INTO articles_article_fts (rowid, title, description, body)
+        VALUES (new.id, new.title, new.description, new.body);
+    END
+    """,
+    # Index the articles written before the triggers existed
+    "INSERT INTO articles_article_fts (articles_article_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS articles_article_fts_insert",
+    "DROP TRIGGER IF EXISTS articles_article_fts_delete",
+    "DROP TRIGGER IF EXISTS articles_article_fts_update",
+    "DROP TABLE IF EXISTS articles_article_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0011_article_changed_at"),
+    ]
+
+    operations = [
+        RunSQLOn("postgresql", POSTGRESQL_FORWARDS, POSTGRESQL_BACKWARDS),
+        RunSQLOn("sqlite", SQLITE_FORWARDS, SQLITE_BACKWARDS),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0012_article_search_index"),
+        ("users", "0003_profile_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["author", "-created_at", "-id"],
+                name="article_author_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+# Django indexes each column of an auto-created through table on its own,
+# plus the unique (forward, reverse) pair. Walking the relation from the
+# other side (a profile's favorites, a tag's articles) needs the pair the
+# other way round to stay on the index.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0013_article_author_created_idx"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS article_favorited_profile_idx "
+            "ON articles_article_favorited_by (profile_id, article_id)",
+            "DROP INDEX IF EXISTS article_favorited_profile_idx",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS article_tags_tag_idx "
+            "ON articles_article_tags (tag_id, article_id)",
+            "DROP INDEX IF EXISTS article_tags_tag_idx",
+        ),
+    ]
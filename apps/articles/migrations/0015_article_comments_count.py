@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_comments_count(apps, schema_editor):
+    Article = apps.get_model("articles", "Article")
+    counts = (
+        Article.objects.filter(pk=OuterRef("pk"))
+        .annotate(count=Count("comments"))
+        .values("count")
+    )
+    Article.objects.update(comments_count=Subquery(counts))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0014_through_reverse_indexes"),
+        ("comments", "0002_comment_article_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_comments_count, migrations.RunPython.noop),
+    ]
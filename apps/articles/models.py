@@ -1,16 +1,28 @@
-from django.db import models
+import re
+
+from django.db import IntegrityError, models, transaction
 from django.utils.text import slugify
 
+SLUG_ALLOCATION_ATTEMPTS = 3
+
 
 # Create your models here.
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
+    # Maintained by the `tags` signal handlers in signals.py
+    articles_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            # The tag cloud lists the most used tags first
+            models.Index(
+                fields=["-articles_count", "name"], name="tag_popularity_idx"
+            ),
+        ]
 
 
 class Article(models.Model):
@@ -20,6 +32,9 @@ class Article(models.Model):
     body = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Moves whenever anything shown for the article changes, including
+    # favorites; used for HTTP validators
+    changed_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(
         "users.Profile",
         on_delete=models.CASCADE,
@@ -30,41 +45,122 @@ class Article(models.Model):
         related_name="favorited_articles",
         blank=True,
     )
+    # Maintained by the `favorited_by` signal handlers in signals.py
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+    # Maintained by the comment signal handlers in comments/signals.py
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
     tags = models.ManyToManyField(Tag, related_name="articles", blank=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination walks (created_at, id) in this order
+            models.Index(
+                fields=["-created_at", "-id"], name="article_created_id_idx"
+            ),
+            # `?author=` pages come straight off this index, without a sort
+            models.Index(
+                fields=["author", "-created_at", "-id"],
+                name="article_author_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored title so `save` can tell whether it changed
+        instance._loaded_title = instance.__dict__.get("title")
+        return instance
+
+    def title_changed(self):
+        if self._state.adding or not self.slug:
+            return True
+
+        loaded_title = getattr(self, "_loaded_title", None)
+        if loaded_title is None:
+            # The title was not loaded with the instance, so ask the database
+            stored = Article.objects.filter(pk=self.pk).values("title").first()
+            return stored is None or stored["title"] != self.title
+
+        return loaded_title != self.title
+
+    def allocate_slug(self):
+        """Return the first free slug for the title, in a single query"""
+        base_slug = slugify(self.title)
+
+        # The prefix match can use the slug index, the regex then keeps
+        # only `base_slug` itself and its `-<counter>` variants
+        taken = set(
+            Article.objects.filter(slug__startswith=base_slug)
+            .filter(slug__regex=rf"^{re.escape(base_slug)}(-[0-9]+)?$")
+            .exclude(pk=self.pk)
+            .values_list("slug", flat=True)
+        )
+
+        # Like a lookup of each candidate in turn, take the first free one,
+        # so slugs freed by deleted articles are reused
+        if base_slug not in taken:
+            return base_slug
+        counter = 1
+        while f"{base_slug}-{counter}" in taken:
+            counter += 1
+        return f"{base_slug}-{counter}"
+
     def save(self, *args, **kwargs):
-        title_changed = True
+        if not self.title_changed():
+            super().save(*args, **kwargs)
+            return
 
-        if self.pk:
-            # Needed to wrap in try except to avoid errors in case
-            # the article was removed before the save operation
+        # Always regenerate slug from current title. Another request may take
+        # the same slug between allocating and saving it; the unique index
+        # rejects the loser, which then allocates again.
+        for attempt in range(SLUG_ALLOCATION_ATTEMPTS):
+            self.slug = self.allocate_slug()
             try:
-                original = Article.objects.get(pk=self.pk)
-                title_changed = original.title != self.title
-            except Article.DoesNotExist:
-                pass
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                break
+            except IntegrityError:
+                if attempt == SLUG_ALLOCATION_ATTEMPTS - 1:
+                    raise
 
-        # Always regenerate slug from current title
-        if not self.slug or title_changed:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            counter = 1
+        self._loaded_title = self.title
 
-            def slug_exists(slug):
-                # Exclude current instance from slug check (for updates)
-                queryset = Article.objects.filter(slug=slug)
-                return queryset.exists()
 
-            while slug_exists(slug):
-                slug = f"{base_slug}-{counter}"
-                counter += 1
+class FeedEntry(models.Model):
+    """
+    An article in a reader's feed, written when the article is published or
+    the reader follows its author (see feed.py)
+    """
 
-            self.slug = slug
+    reader = models.ForeignKey(
+        "users.Profile",
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+    )
+    article = models.ForeignKey(
+        Article,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+    )
+    # Copied from the article so a reader's feed is one index range scan
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["reader", "article"], name="unique_feed_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["reader", "-created_at", "-article"],
+                name="feed_reader_created_idx",
+            ),
+        ]
 
-        super().save(*args, **kwargs)
+    def __str__(self):
+        return f"{self.article} in the feed of {self.reader}"
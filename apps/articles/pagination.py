@@ -0,0 +1,273 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.paginator import InvalidPage, Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from api.asyncviews import alist
+
+from . import counting
+
+
+class CountedPaginator(DjangoPaginator):
+    """Django paginator that takes its total from a callable"""
+
+    def __init__(self, object_list, per_page, get_count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.get_count = get_count
+
+    @cached_property
+    def count(self):
+        return self.get_count()
+
+
+class FlexiblePagination(PageNumberPagination):
+    """
+    Supports page/limit, limit/offset and cursor pagination styles
+
+    Cursor pagination is opt-in: send `?cursor=` (empty for the first page)
+    and follow the returned `next`/`previous` links. It pages by
+    (created_at, id) and never counts the queryset.
+
+    Views that set a `count_scope` describing their filters get their totals
+    from the cached/estimated counting layer in `counting.py`.
+    """
+
+    page_size = 20
+    page_size_query_param = "limit"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    cursor_ordering = ("-created_at", "-id")
+
+    def django_paginator_class(self, queryset, page_size):
+        # Used by `PageNumberPagination` in place of Django's paginator
+        return CountedPaginator(
+            queryset, page_size, lambda: self.get_count(queryset)
+        )
+
+    def get_count(self, queryset):
+        """Count `queryset`, through the counting layer where possible"""
+        scope = getattr(self.view, "count_scope", None)
+        if scope is None:
+            return queryset.count()
+
+        count, self.count_approximate = counting.get_count(queryset, scope)
+        return count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        self.count_approximate = False
+
+        if self.cursor_query_param in request.query_params:
+            return self.paginate_cursor(queryset, request)
+
+        # Check if offset is provided (LimitOffset style)
+        offset_limit = self.get_offset_limit(request)
+        if offset_limit is not None:
+            offset, limit = offset_limit
+            self.count = self.get_count(queryset)
+            return list(queryset[offset : offset + limit])
+
+        # Fall back to page/page_size pagination
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` on the async ORM (see api/asyncviews.py)"""
+        self.view = view
+        self.count_approximate = False
+
+        if self.cursor_query_param in request.query_params:
+            return await self.apaginate_cursor(queryset, request)
+
+        offset_limit = self.get_offset_limit(request)
+        if offset_limit is not None:
+            offset, limit = offset_limit
+            self.count = await self.aget_count(queryset)
+            return await alist(queryset[offset : offset + limit])
+
+        # As `PageNumberPagination.paginate_queryset`, with the count and
+        # the page loaded up front
+        self.request = request
+        page_size = self.get_page_size(request)
+        count = await self.aget_count(queryset)
+        paginator = CountedPaginator(queryset, page_size, lambda: count)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        self.page.object_list = await alist(self.page.object_list)
+        return list(self.page)
+
+    def get_offset_limit(self, request):
+        """Return `(offset, limit)` for limit/offset requests, else None"""
+        offset = request.query_params.get("offset")
+        limit = request.query_params.get("limit", self.page_size)
+        if offset is None:
+            return None
+
+        try:
+            offset = int(offset)
+            limit = int(limit)
+        except (ValueError, TypeError):
+            return None
+        # Querysets reject negative slices; page by page number instead
+        if offset < 0 or limit <= 0:
+            return None
+        limit = min(limit, self.max_page_size)  # Respect max limit
+
+        self.limit = limit
+        self.offset = offset
+        self.request = request
+        return offset, limit
+
+    async def aget_count(self, queryset):
+        scope = getattr(self.view, "count_scope", None)
+        if scope is None:
+            return await queryset.acount()
+
+        count, self.count_approximate = await counting.aget_count(
+            queryset, scope
+        )
+        return count
+
+    def paginate_cursor(self, queryset, request):
+        queryset, position = self.get_cursor_queryset(queryset, request)
+        # Fetch one extra row to know whether there is anything beyond it
+        return self.get_cursor_page(list(queryset[: self.limit + 1]), position)
+
+    async def apaginate_cursor(self, queryset, request):
+        queryset, position = self.get_cursor_queryset(queryset, request)
+        return self.get_cursor_page(
+            await alist(queryset[: self.limit + 1]), position
+        )
+
+    def get_cursor_queryset(self, queryset, request):
+        """Return the queryset after the cursor, and the decoded cursor"""
+        self.request = request
+        self.limit = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.cursor_ordering)
+        if position is not None:
+            created_at, pk, reverse = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at)
+                    | Q(created_at=created_at, pk__gt=pk)
+                ).reverse()
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at)
+                    | Q(created_at=created_at, pk__lt=pk)
+                )
+        return queryset, position
+
+    def get_cursor_page(self, results, position):
+        """Trim the extra row off `results` and set the links around them"""
+        reverse = position is not None and position[2]
+        has_more = len(results) > self.limit
+        results = results[: self.limit]
+        if reverse:
+            results.reverse()
+
+        self.next_position = None
+        self.previous_position = None
+        if results and (has_more or reverse):
+            last = results[-1]
+            self.next_position = (last.created_at, last.pk, False)
+        if results and (has_more if reverse else position is not None):
+            first = results[0]
+            self.previous_position = (first.created_at, first.pk, True)
+
+        return results
+
+    def encode_cursor(self, position):
+        created_at, pk, reverse = position
+        token = json.dumps([created_at.isoformat(), pk, reverse])
+        cursor = base64.urlsafe_b64encode(token.encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+
+        try:
+            token = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, pk, reverse = json.loads(token)
+            return datetime.fromisoformat(created_at), int(pk), bool(reverse)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound("Invalid cursor.")
+
+    def get_paginated_response(self, data):
+        # If we used cursor style
+        if hasattr(self, "next_position"):
+            return Response(
+                {
+                    "next": self.get_next_link(),
+                    "previous": self.get_previous_link(),
+                    "results": data,
+                }
+            )
+
+        # If we used offset/limit style
+        if hasattr(self, "offset"):
+            response = Response(
+                {
+                    "count": self.count,
+                    "next": self.get_next_link(),
+                    "previous": self.get_previous_link(),
+                    "results": data,
+                }
+            )
+        # Otherwise use standard page response
+        else:
+            response = super().get_paginated_response(data)
+
+        if self.count_approximate:
+            response.data["count_approximate"] = True
+        return response
+
+    def get_next_link(self):
+        if hasattr(self, "next_position"):
+            if self.next_position is None:
+                return None
+            return self.encode_cursor(self.next_position)
+
+        if hasattr(self, "offset"):
+            if self.offset + self.limit >= self.count:
+                return None
+
+            url = self.request.build_absolute_uri()
+            offset = self.offset + self.limit
+            return f"{url.split('?')[0]}?limit={self.limit}&offset={offset}"
+
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if hasattr(self, "previous_position"):
+            if self.previous_position is None:
+                return None
+            return self.encode_cursor(self.previous_position)
+
+        if hasattr(self, "offset"):
+            if self.offset <= 0:
+                return None
+
+            url = self.request.build_absolute_uri()
+            offset = max(0, self.offset - self.limit)
+            return f"{url.split('?')[0]}?limit={self.limit}&offset={offset}"
+
+        return super().get_previous_link()
@@ -0,0 +1,234 @@
+import json
+import re
+from pathlib import Path
+
+from django.db import connections
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .counting import get_plan
+from .models import Article
+from .views import ArticleViewSet
+from ..comments.views import CommentViewset
+from ..users.models import Profile
+from ..users.views import FollowListView
+
+# Query plans of the querysets behind each API endpoint, checked by
+# `QueryPlanTests` and the `check_query_plans` command against a seeded
+# dataset (see dataset.py). A plan fails when it reads a large table from
+# start to end, when it sorts rows that an index should return in order, or
+# when its PostgreSQL cost grows past the stored baseline.
+
+BASELINE_PATH = Path(__file__).with_name("query_plan_baseline.json")
+
+# Size of the dataset the baseline costs were taken on
+DATASET = {"users": 200, "articles": 2000}
+
+# A plan may cost this much more than its baseline before it fails
+COST_TOLERANCE = 1.5
+
+# Tables that grow with usage and must always be reached through an index
+LARGE_TABLES = {
+    "articles_article",
+    "articles_article_favorited_by",
+    "articles_article_tags",
+    "articles_feedentry",
+    "authentication_user",
+    "comments_comment",
+    "users_profile",
+    "users_profile_followers",
+}
+
+# Endpoints whose pages must come off an index in order, not from a sort
+INDEX_ORDERED = {
+    "article-list",
+    "article-list-author",
+    "article-feed",
+    "comment-list",
+    "profile-followers",
+    "profile-following",
+}
+
+PAGE_SIZE = 20
+
+
+def get_view(viewset, path, action="list", **kwargs):
+    request = Request(APIRequestFactory().get(path))
+    return viewset(
+        request=request, action=action, kwargs=kwargs, format_kwarg=None
+    )
+
+
+def get_querysets(sample):
+    """
+    Return `{name: queryset}` for every endpoint, filtered on the rows of
+    `sample` (see `get_sample`)
+    """
+    article, profile, tag = sample["article"], sample["profile"], sample["tag"]
+    username = profile.user.username
+
+    def article_page(path):
+        return get_view(ArticleViewSet, path).get_queryset()[:PAGE_SIZE]
+
+    return {
+        "article-list": article_page("/api/articles/"),
+        "article-list-tag": article_page(f"/api/articles/?tag={tag.name}"),
+        "article-list-author": article_page(
+            f"/api/articles/?author={username}"
+        ),
+        "article-list-favorited": article_page(
+            f"/api/articles/?favorited={username}"
+        ),
+        "article-list-search": article_page("/api/articles/?q=seed"),
+        "article-list-slugs": article_page(
+            f"/api/articles/?slug={article.slug}&slug={article.slug}-1"
+        ),
+        "article-feed": get_view(
+            ArticleViewSet, "/api/articles/feed/", "feed"
+        ).get_feed_queryset(profile)[:PAGE_SIZE],
+        "article-detail": get_view(
+            ArticleViewSet, f"/api/articles/{article.slug}/", "retrieve"
+        )
+        .get_queryset()
+        .filter(slug=article.slug),
+        # Viewer flags resolved for each page of articles
+        "article-favorited-ids": Article.favorited_by.through.objects.filter(
+            article_id__in=[article.pk], profile__user=profile.user_id
+        ).values_list("article_id", flat=True),
+        "profile-following-ids": Profile.followers.through.objects.filter(
+            from_profile_id__in=[article.author_id],
+            to_profile__user=profile.user_id,
+        ).values_list("from_profile_id", flat=True),
+        "comment-list": get_view(
+            CommentViewset,
+            f"/api/articles/{article.slug}/comments/",
+            article_slug=article.slug,
+        ).get_queryset()[:PAGE_SIZE],
+        **{
+            f"profile-{relation}": FollowListView(
+                kwargs={"username": username}, relation=relation
+            )
+            .get_queryset()
+            .order_by("-id")[:PAGE_SIZE]
+            for relation in ("followers", "following")
+        },
+    }
+
+
+def get_sample():
+    """Pick the rows the endpoint querysets are filtered on"""
+    article = Article.objects.order_by("-pk").first()
+    profile = (
+        Profile.objects.filter(favorited_articles__isnull=False)
+        .filter(following__isnull=False)
+        .order_by("-pk")
+        .first()
+    )
+    return {
+        "article": article,
+        "profile": profile,
+        "tag": article.tags.order_by("-articles_count").first(),
+    }
+
+
+def explain(queryset):
+    """
+    Return `(full_scans, sorts, cost)` for `queryset`: the large tables it
+    reads in full, whether it sorts, and the planner's total cost (None
+    outside PostgreSQL)
+    """
+    connection = connections[queryset.db]
+    limited = queryset.query.high_mark is not None
+
+    if connection.vendor == "postgresql":
+        cost = get_plan(queryset.explain(format="json"))["Total Cost"]
+        # The seeded tables are small enough for the planner to read them
+        # whole or sort them at will; the plans it makes when it may not
+        # show whether an index could serve the query
+        full_scans = {
+            node["Relation Name"]
+            for node in walk_plan(queryset, enable_seqscan="off")
+            if node["Node Type"] == "Seq Scan"
+            or (
+                # A walk along a whole index only stops early at a LIMIT
+                node["Node Type"] in ("Index Scan", "Index Only Scan")
+                and "Index Cond" not in node
+                and not limited
+            )
+        }
+        sorts = any(
+            node["Node Type"] in ("Sort", "Incremental Sort")
+            for node in walk_plan(
+                queryset, enable_seqscan="off", enable_sort="off"
+            )
+        )
+        return full_scans & LARGE_TABLES, sorts, cost
+
+    # SQLite lists "SEARCH <table> USING INDEX ..." for index lookups,
+    # "SCAN <table>" for full table scans and "SCAN <table> USING INDEX ..."
+    # for walks along an index, which only stop early at a LIMIT
+    plan = queryset.explain()
+    scans = {
+        table
+        for table, along_index in re.findall(
+            r"\bSCAN (\w+)( USING (?:COVERING )?INDEX)?", plan
+        )
+        if not (along_index and limited)
+    }
+    sorts = bool(
+        re.search(r"USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY", plan)
+    )
+    return scans & LARGE_TABLES, sorts, None
+
+
+def walk_plan(queryset, **options):
+    """Return every node of `queryset`'s PostgreSQL plan under `options`"""
+    with connections[queryset.db].cursor() as cursor:
+        for name, value in options.items():
+            cursor.execute(f"SET {name} = {value}")
+        try:
+            plan = get_plan(queryset.explain(format="json"))
+        finally:
+            for name in options:
+                cursor.execute(f"RESET {name}")
+
+    nodes = [plan]
+    for node in nodes:
+        nodes.extend(node.get("Plans", []))
+    return nodes
+
+
+def load_baseline(vendor):
+    if not BASELINE_PATH.exists():
+        return {}
+    return json.loads(BASELINE_PATH.read_text()).get(vendor, {})
+
+
+def save_baseline(vendor, costs):
+    baseline = {}
+    if BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text())
+    baseline[vendor] = dict(sorted(costs.items()))
+    BASELINE_PATH.write_text(json.dumps(baseline, indent=2) + "\n")
+
+
+def check(querysets, baseline):
+    """Return `(costs, problems)` for `querysets` compared to `baseline`"""
+    costs, problems = {}, []
+
+    for name, queryset in querysets.items():
+        full_scans, sorts, cost = explain(queryset)
+        for table in sorted(full_scans):
+            problems.append(f"{name}: sequential scan on {table}")
+        if sorts and name in INDEX_ORDERED:
+            problems.append(f"{name}: sorts rows instead of reading an index")
+
+        if cost is None:
+            continue
+        costs[name] = cost
+        if name in baseline and cost > baseline[name] * COST_TOLERANCE:
+            problems.append(
+                f"{name}: cost {cost:.2f} exceeds baseline {baseline[name]:.2f}"
+            )
+
+    return costs, problems
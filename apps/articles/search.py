@@ -0,0 +1,78 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Ranked full-text search over article titles, descriptions and bodies.
+#
+# PostgreSQL: a stored generated `search_vector` tsvector column on
+# `articles_article` with a GIN index. SQLite (local development and
+# tests): an external-content FTS5 table kept in step by triggers. Both are
+# created by migration 0012 and maintained by the database itself whenever
+# an article is written.
+
+TABLE = "articles_article"
+FTS_TABLE = "articles_article_fts"
+
+
+def get_terms(query):
+    """Split a user query into words safe to hand to FTS5 as literals"""
+    return [f'"{word}"' for word in re.findall(r"\w+", query)]
+
+
+def search(queryset, query):
+    """
+    Filter `queryset` to the articles matching `query`, annotated with a
+    `search_rank` where higher ranks are better matches
+    """
+    vendor = connections[queryset.db].vendor
+
+    if vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('english', %s)"
+        matches = RawSQL(
+            f"{TABLE}.search_vector @@ {tsquery}",
+            [query],
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f"ts_rank({TABLE}.search_vector, {tsquery})",
+            [query],
+            output_field=FloatField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+    if vendor == "sqlite":
+        terms = get_terms(query)
+        if not terms:
+            return queryset.none().annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+
+        # All words must match (FTS5's implicit AND); bm25() is lower for
+        # better matches, so it is negated
+        match = " ".join(terms)
+        matches = RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [match],
+        )
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, 10.0, 4.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {TABLE}.id",
+            [match],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+    # Other backends fall back to an unranked substring match
+    words = re.findall(r"\w+", query)
+    condition = Q()
+    for word in words:
+        condition &= (
+            Q(title__icontains=word)
+            | Q(description__icontains=word)
+            | Q(body__icontains=word)
+        )
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
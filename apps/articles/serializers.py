@@ -1,7 +1,14 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
+from api.asyncviews import alist
+from api.metrics import TimedSerializerMixin
+
 from .models import Article, Tag
-from ..users.serializers import ProfileViewSerializer
+from ..users.serializers import ProfileViewSerializer, get_following_ids
 
 # how serializers handle serialization:
 # - `to_representation`: Converts model instance to a data type suitable for output (e.g., JSON).
@@ -30,58 +37,191 @@ class TagsField(serializers.Field):
                 raise serializers.ValidationError("Tag names cannot be empty.")
             tag_names.append(tag_name.strip())
 
-        return tag_names
+        # Drop repeated names, keeping the order they were sent in
+        return list(dict.fromkeys(tag_names))
+
+
+def set_tags(article, tag_names, created=False):
+    """Link `article` to exactly `tag_names`, creating missing tags"""
+    # Insert the missing tags in one statement; concurrent requests creating
+    # the same tag are absorbed by the unique constraint
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in tag_names], ignore_conflicts=True
+    )
+    tag_ids = set(
+        Tag.objects.filter(name__in=tag_names).values_list("pk", flat=True)
+    )
+
+    current_ids = set()
+    if not created:
+        current_ids = set(
+            Article.tags.through.objects.filter(article=article).values_list(
+                "tag_id", flat=True
+            )
+        )
+
+    # Only touch the links that changed
+    if current_ids - tag_ids:
+        article.tags.remove(*(current_ids - tag_ids))
+    if tag_ids - current_ids:
+        article.tags.add(*(tag_ids - current_ids))
+
+
+def get_favorites(request, articles):
+    """
+    Return the ids of `articles` favorited by the requesting user, as a
+    queryset, or None for anonymous requests
+    """
+    if not request or not request.user.is_authenticated:
+        return None
+
+    favorites = Article.favorited_by.through.objects.filter(
+        article_id__in=[article.pk for article in articles],
+        profile__user=request.user,
+    )
+    return favorites.values_list("article_id", flat=True)
+
+
+def get_favorited_ids(request, articles):
+    """Return the ids of `articles` favorited by the requesting user"""
+    favorites = get_favorites(request, articles)
+    return set() if favorites is None else set(favorites)
+
+
+async def aget_favorited_ids(request, articles):
+    favorites = get_favorites(request, articles)
+    return set() if favorites is None else set(await alist(favorites))
+
+
+# Bump when the serialized shape of an article changes
+FRAGMENT_VERSION = 3
+
+
+def get_fragment_key(article):
+    """
+    Cache key of the viewer-independent representation of `article`
+
+    The key moves with the article's and its author's change markers, so
+    edits, retags, favorites and author profile edits never hit a stale
+    fragment.
+    """
+    return (
+        f"article-fragment:{FRAGMENT_VERSION}:{article.pk}:"
+        f"{article.changed_at.timestamp()}:"
+        f"{article.author.updated_at.timestamp()}"
+    )
+
+
+class ArticleListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Resolves per-viewer flags for a whole page of articles at once"""
+
+    def to_representation(self, data):
+        articles = list(data.all() if hasattr(data, "all") else data)
+        prefetch_related_objects(articles, "author__user")
+
+        request = self.context.get("request")
+        authors = [article.author for article in articles]
+        # The view may have resolved these already
+        if "favorited_ids" not in self.context:
+            self.context["favorited_ids"] = get_favorited_ids(request, articles)
+        if "following_ids" not in self.context:
+            self.context["following_ids"] = get_following_ids(request, authors)
+
+        keys = [get_fragment_key(article) for article in articles]
+        self.context["fragments"] = cache.get_many(keys)
+        return super().to_representation(articles)
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = ProfileViewSerializer(read_only=True)
     tags = TagsField(required=False)
     favorites_count = serializers.ReadOnlyField()
+    comments_count = serializers.ReadOnlyField()
 
     class Meta:
         model = Article
-        exclude = ("id", "favorited_by")
+        list_serializer_class = ArticleListSerializer
+        exclude = ("id", "favorited_by", "changed_at")
         read_only_fields = (
             "author",
             "slug",
             "favorites_count",
+            "comments_count",
             "created_at",
             "updated_at",
         )
 
-    def to_representation(self, instance):
-        rep = super().to_representation(instance)
-        request = self.context.get("request")
+    def get_fragment(self, instance):
+        """Return the cached part of the representation shared by all viewers"""
+        key = get_fragment_key(instance)
+
+        # Populated by `ArticleListSerializer` for list responses
+        fragments = self.context.get("fragments")
+        fragment = (
+            fragments.get(key) if fragments is not None else cache.get(key)
+        )
+
+        if fragment is None:
+            fragment = super().to_representation(instance)
+            fragment["author"].pop("following")
+            cache.set(key, fragment, settings.ARTICLE_FRAGMENT_CACHE_TIMEOUT)
+
+        return fragment
 
-        rep["favorited"] = False
-        if request and request.user.is_authenticated:
-            user_who_favorited = instance.favorited_by.filter(user=request.user)
-            rep["favorited"] = user_who_favorited.exists()
+    def to_representation(self, instance):
+        fragment = self.get_fragment(instance)
 
+        # Overlay the fields that depend on the viewer, populated by
+        # `ArticleListSerializer` for list responses
+        request = self.context.get("request")
+        favorited_ids = self.context.get("favorited_ids")
+        if favorited_ids is None:
+            favorited_ids = get_favorited_ids(request, [instance])
+        following_ids = self.context.get("following_ids")
+        if following_ids is None:
+            following_ids = get_following_ids(request, [instance.author])
+
+        rep = {**fragment, "author": {**fragment["author"]}}
+        rep["author"]["following"] = instance.author_id in following_ids
+        rep["favorited"] = instance.pk in favorited_ids
         return rep
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags", [])
 
         article = Article.objects.create(**validated_data)
-
-        for tag in tags:
-            tag_instance, _ = Tag.objects.get_or_create(name=tag)
-            article.tags.add(tag_instance)
+        set_tags(article, tags, created=True)
 
         return article
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags", None)
 
         if tags is not None:
-            instance.tags.clear()
-            for tag in tags:
-                tag_instance, _ = Tag.objects.get_or_create(name=tag)
-                instance.tags.add(tag_instance)
+            set_tags(instance, tags)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
 
         return instance
+
+
+# Articles a single request may fetch by slug or (un)favorite at once
+MAX_SLUGS = 100
+
+
+class ArticleSlugsSerializer(serializers.Serializer):
+    """Slugs of the articles to favorite or unfavorite in bulk"""
+
+    slugs = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=MAX_SLUGS,
+    )
+
+    def validate_slugs(self, slugs):
+        # Drop repeated slugs, keeping the order they were sent in
+        return list(dict.fromkeys(slugs))
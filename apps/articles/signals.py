@@ -0,0 +1,311 @@
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counting, feed, search
+from .models import Article, Tag
+from ..users.models import Profile
+
+
+# `favorites_count` is kept in step with the `favorited_by` through table.
+# Rows written straight to the through table (e.g. `bulk_create`) bypass
+# these handlers; run `manage.py reconcile_counters --fix` afterwards.
+
+
+def change_favorites_count(article_ids, delta):
+    """Atomically shift the stored favorites count of the given articles"""
+    if article_ids and delta:
+        Article.objects.filter(pk__in=article_ids).update(
+            favorites_count=F("favorites_count") + delta,
+            changed_at=timezone.now(),
+        )
+
+
+def discard_existing_favorites(sender, instance, reverse, pk_set):
+    """
+    Lock the articles about to be favorited, then drop from `pk_set` the
+    links that a concurrent add created after Django looked for them
+    """
+    if reverse:
+        article_ids = pk_set
+        links = sender.objects.filter(profile=instance, article_id__in=pk_set)
+        existing = links.values_list("article_id", flat=True)
+    else:
+        article_ids = [instance.pk]
+        links = sender.objects.filter(article=instance, profile_id__in=pk_set)
+        existing = links.values_list("profile_id", flat=True)
+
+    locked = Article.objects.filter(pk__in=article_ids).order_by("pk")
+    list(locked.select_for_update().values_list("pk", flat=True))
+    pk_set.difference_update(existing)
+
+
+@receiver(m2m_changed, sender=Article.favorited_by.through)
+def update_favorites_count(sender, instance, action, reverse, pk_set, **kwargs):
+    # `instance` is a Profile when the change is made through
+    # `profile.favorited_articles`, otherwise it is an Article
+    if action == "pre_add":
+        # Django inserts and reports the same `pk_set` after this signal, so
+        # a favorite added twice at once is inserted and counted only once
+        discard_existing_favorites(sender, instance, reverse, pk_set)
+
+    elif action == "post_add":
+        if reverse:
+            change_favorites_count(pk_set, 1)
+        else:
+            change_favorites_count([instance.pk], len(pk_set))
+
+    elif action in ("pre_remove", "pre_clear"):
+        if reverse:
+            links = sender.objects.filter(profile=instance)
+            if pk_set is not None:
+                links = links.filter(article_id__in=pk_set)
+        else:
+            links = sender.objects.filter(article=instance)
+            if pk_set is not None:
+                links = links.filter(profile_id__in=pk_set)
+
+        # Lock the links about to be deleted so that concurrent removals
+        # of the same favorite are not counted twice
+        article_ids = list(
+            links.select_for_update().values_list("article_id", flat=True)
+        )
+        if reverse:
+            change_favorites_count(article_ids, -1)
+        else:
+            change_favorites_count([instance.pk], -len(article_ids))
+
+
+@receiver(pre_delete, sender=Profile)
+def discard_profile_favorites(sender, instance, **kwargs):
+    # Deleting a profile cascades to its favorites without `m2m_changed`
+    article_ids = Article.favorited_by.through.objects.filter(
+        profile=instance
+    ).values_list("article_id", flat=True)
+    change_favorites_count(list(article_ids), -1)
+
+
+# `Tag.articles_count` follows the `tags` through table the same way, and the
+# cached tag cloud served by `TagViewSet` is dropped whenever it changes.
+
+TAG_CLOUD_CACHE_KEY = "tags:cloud"
+
+
+def touch_articles(article_ids):
+    """Move the change marker of articles whose tags changed"""
+    Article.objects.filter(pk__in=article_ids).update(changed_at=timezone.now())
+
+
+def change_tag_counts(tag_ids, delta):
+    """Atomically shift the stored article count of the given tags"""
+    if tag_ids and delta:
+        Tag.objects.filter(pk__in=tag_ids).update(
+            articles_count=F("articles_count") + delta
+        )
+        transaction.on_commit(lambda: cache.delete(TAG_CLOUD_CACHE_KEY))
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_tag_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    # `instance` is a Tag when the change is made through `tag.articles`,
+    # otherwise it is an Article
+    if action == "post_add":
+        if reverse:
+            change_tag_counts([instance.pk], len(pk_set))
+            touch_articles(pk_set)
+        else:
+            change_tag_counts(pk_set, 1)
+            touch_articles([instance.pk])
+
+    elif action in ("pre_remove", "pre_clear"):
+        if reverse:
+            links = sender.objects.filter(tag=instance)
+            if pk_set is not None:
+                links = links.filter(article_id__in=pk_set)
+        else:
+            links = sender.objects.filter(article=instance)
+            if pk_set is not None:
+                links = links.filter(tag_id__in=pk_set)
+
+        tag_ids = list(
+            links.select_for_update().values_list("tag_id", flat=True)
+        )
+        if reverse:
+            change_tag_counts([instance.pk], -len(tag_ids))
+            touch_articles(links.values_list("article_id", flat=True))
+        else:
+            change_tag_counts(tag_ids, -1)
+            touch_articles([instance.pk])
+
+
+@receiver(pre_delete, sender=Article)
+def discard_article_tags(sender, instance, **kwargs):
+    # Deleting an article cascades to its tag links without `m2m_changed`
+    tag_ids = Article.tags.through.objects.filter(article=instance).values_list(
+        "tag_id", flat=True
+    )
+    change_tag_counts(list(tag_ids), -1)
+
+
+# Cached pagination totals, see counting.py
+
+
+@receiver(post_save, sender=Article)
+def invalidate_counts_on_create(sender, instance, created, **kwargs):
+    if created:
+        counting.bump_versions("articles")
+    else:
+        # Edits can change which articles match a search
+        counting.bump_versions("search")
+
+
+@receiver(post_delete, sender=Article)
+def invalidate_counts_on_delete(sender, instance, **kwargs):
+    counting.bump_versions("articles")
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def invalidate_counts_on_retag(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        counting.bump_versions("articles")
+
+
+@receiver(m2m_changed, sender=Article.favorited_by.through)
+def invalidate_favorited_counts(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if reverse:
+        usernames = [instance.user.username]
+    else:
+        profiles = (
+            instance.favorited_by.all()
+            if pk_set is None
+            else Profile.objects.filter(pk__in=pk_set)
+        )
+        usernames = profiles.values_list("user__username", flat=True)
+
+    counting.bump_versions(*[f"favorited:{name}" for name in usernames])
+
+
+@receiver(m2m_changed, sender=Profile.followers.through)
+def invalidate_feed_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    # `profile.followers` changes the feeds of the followers in `pk_set`,
+    # `profile.following` changes the feed of `profile` itself
+    if reverse:
+        reader_ids = [instance.pk]
+    elif pk_set is None:
+        reader_ids = instance.followers.values_list("pk", flat=True)
+    else:
+        reader_ids = pk_set
+
+    counting.bump_versions(*[f"feed:{pk}" for pk in reader_ids])
+
+
+# Materialized feeds, see feed.py
+
+
+@receiver(post_save, sender=Article)
+def fan_out_new_article(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(m2m_changed, sender=Profile.followers.through)
+def update_feeds_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    # With `reverse`, `instance` is the reader and `pk_set` the authors;
+    # otherwise `instance` is the author and `pk_set` the readers
+    if action == "pre_clear":
+        related = instance.following if reverse else instance.followers
+        pk_set = set(related.values_list("pk", flat=True))
+    elif action not in ("post_add", "post_remove"):
+        return
+
+    if not pk_set:
+        return
+
+    reader_ids, author_ids = ([instance.pk], pk_set)
+    if not reverse:
+        reader_ids, author_ids = author_ids, reader_ids
+
+    if action == "post_add":
+        feed.add_follows(reader_ids, author_ids)
+    else:
+        feed.remove_follows(reader_ids, author_ids)
+
+
+# Full-text search index, see search.py. Later migrations may rebuild the
+# articles table on SQLite, which drops the triggers migration 0012 created
+# to keep the index current; they are put back after every migrate.
+
+SQLITE_SEARCH_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {search.FTS_TABLE}_insert
+    AFTER INSERT ON {search.TABLE}
+    BEGIN
+        INSERT INTO {search.FTS_TABLE} (rowid, title, description, body)
+        VALUES (new.id, new.title, new.description, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {search.FTS_TABLE}_delete
+    AFTER DELETE ON {search.TABLE}
+    BEGIN
+        INSERT INTO {search.FTS_TABLE}
+            ({search.FTS_TABLE}, rowid, title, description, body)
+        VALUES ('delete', old.id, old.title, old.description, old.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {search.FTS_TABLE}_update
+    AFTER UPDATE ON {search.TABLE}
+    BEGIN
+        INSERT INTO {search.FTS_TABLE}
+            ({search.FTS_TABLE}, rowid, title, description, body)
+        VALUES ('delete', old.id, old.title, old.description, old.body);
+        INSERT INTO {search.FTS_TABLE} (rowid, title, description, body)
+        VALUES (new.id, new.title, new.description, new.body);
+    END
+    """,
+]
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    connection = connections[using]
+    if sender.name != "apps.articles" or connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, count(*) FROM sqlite_master "
+            "WHERE (type = 'table' AND name = %s) "
+            "OR (type = 'trigger' AND tbl_name = %s) GROUP BY type",
+            [search.FTS_TABLE, search.TABLE],
+        )
+        found = dict(cursor.fetchall())
+        # Nothing to restore when migrated back past the index
+        if not found.get("table") or found.get("trigger", 0) >= 3:
+            return
+
+        for statement in SQLITE_SEARCH_TRIGGERS:
+            cursor.execute(statement)
+        # Index the articles written while the triggers were missing
+        cursor.execute(
+            f"INSERT INTO {search.FTS_TABLE} ({search.FTS_TABLE}) "
+            "VALUES ('rebuild')"
+        )
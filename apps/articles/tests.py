@@ -1,3 +1,1246 @@
-from django.test import TestCase
+import json
+import time
+from asyncio import iscoroutinefunction
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api import metrics
+from api import urls as api_urls
+from api.asyncviews import async_read_urls
+from api.replicas import PIN_COOKIE
+
+from . import counting, dataset, plans, signals
+from .models import Article, FeedEntry, Tag
+from .serializers import ArticleSerializer
+from ..authentication.models import User
+from ..authentication.tokens import RefreshToken
+from ..comments.models import Comment
+from ..users.models import Profile
+
+# The API with the async read views swapped in, for AsyncReadParityTests
+urlpatterns = async_read_urls(api_urls.urlpatterns)
+
+
+class ArticleQueryCountTests(APITestCase):
+    """The number of queries for a page must not grow with the page size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            email="viewer@example.com", username="viewer", password="password"
+        )
+        for i in range(10):
+            author = User.objects.create_user(
+                email=f"author{i}@example.com",
+                username=f"author{i}",
+                password="password",
+            ).profile
+            author.followers.add(cls.viewer.profile)
+            article = Article.objects.create(
+                title=f"Article {i}",
+                description="description",
+                body="body",
+                author=author,
+            )
+            article.favorited_by.add(cls.viewer.profile)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data["results"]
+
+    def assert_constant_queries(self, path):
+        small_count, small_page = self.count_queries(f"{path}?limit=2&offset=0")
+        large_count, large_page = self.count_queries(
+            f"{path}?limit=10&offset=0"
+        )
+
+        self.assertEqual(len(small_page), 2)
+        self.assertEqual(len(large_page), 10)
+        self.assertEqual(small_count, large_count)
+        for article in large_page:
+            self.assertTrue(article["favorited"])
+            self.assertTrue(article["author"]["following"])
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        self.client.force_authenticate(self.viewer)
+        self.assert_constant_queries("/api/articles/")
+
+    def test_feed_queries_do_not_grow_with_page_size(self):
+        self.client.force_authenticate(self.viewer)
+        self.assert_constant_queries("/api/articles/feed/")
+
+    def test_anonymous_viewer_gets_no_flags(self):
+        response = self.client.get("/api/articles/")
+
+        for article in response.data["results"]:
+            self.assertFalse(article["favorited"])
+            self.assertFalse(article["author"]["following"])
+
+
+class FavoritesCountTests(TestCase):
+    """The stored favorites count must follow every change to favorited_by"""
+
+    def setUp(self):
+        self.profiles = [
+            User.objects.create_user(
+                email=f"user{i}@example.com",
+                username=f"user{i}",
+                password="password",
+            ).profile
+            for i in range(3)
+        ]
+        self.article = Article.objects.create(
+            title="Counted",
+            description="description",
+            body="body",
+            author=self.profiles[0],
+        )
+
+    def assert_count(self, expected):
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.favorites_count, expected)
+
+    def test_add_and_remove(self):
+        self.article.favorited_by.add(*self.profiles)
+        self.article.favorited_by.add(self.profiles[0])
+        self.assert_count(3)
+
+        self.article.favorited_by.remove(self.profiles[0], self.profiles[0])
+        self.article.favorited_by.remove(self.profiles[0])
+        self.assert_count(2)
+
+        self.article.favorited_by.clear()
+        self.assert_count(0)
+
+    def test_reverse_changes(self):
+        other = Article.objects.create(
+            title="Other",
+            description="description",
+            body="body",
+            author=self.profiles[0],
+        )
+        self.profiles[1].favorited_articles.add(self.article, other)
+        self.profiles[2].favorited_articles.add(self.article)
+        self.assert_count(2)
+
+        self.profiles[1].favorited_articles.clear()
+        self.assert_count(1)
+        other.refresh_from_db()
+        self.assertEqual(other.favorites_count, 0)
+
+    def test_profile_deletion(self):
+        self.article.favorited_by.add(self.profiles[1], self.profiles[2])
+        self.profiles[1].user.delete()
+        self.assert_count(1)
+
+    def add_while_racing(self, profile, racer):
+        """Favorite the article as `profile` while `racer` favorites it too"""
+        discard = signals.discard_existing_favorites
+        raced = False
+
+        def race(*args):
+            # The racing add lands after this one looked for missing links
+            nonlocal raced
+            if not raced:
+                raced = True
+                self.article.favorited_by.add(racer)
+            discard(*args)
+
+        with mock.patch.object(signals, "discard_existing_favorites", race):
+            self.article.favorited_by.add(profile)
+
+    def test_racing_adds_of_one_favorite(self):
+        self.add_while_racing(self.profiles[1], self.profiles[1])
+        self.assert_count(1)
+
+    def test_racing_adds_of_different_favorites(self):
+        self.add_while_racing(self.profiles[1], self.profiles[2])
+        self.assert_count(2)
+
+    def test_reconcile_repairs_drift(self):
+        self.article.favorited_by.add(self.profiles[1])
+        Article.objects.filter(pk=self.article.pk).update(favorites_count=7)
+        self.article.refresh_from_db()
+        changed_at = self.article.changed_at
+
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("1 drifted rows found", out.getvalue())
+        self.assert_count(7)
+
+        call_command("reconcile_counters", "--fix", stdout=out)
+        self.assert_count(1)
+        # Cached fragments and ETags keyed on the marker see the repair
+        self.assertGreater(self.article.changed_at, changed_at)
+
+
+class CursorPaginationTests(APITestCase):
+    """Cursor pages must cover every article once, in both directions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        ).profile
+        for i in range(7):
+            Article.objects.create(
+                title=f"Article {i}",
+                description="description",
+                body="body",
+                author=author,
+            )
+        # Ties on created_at must be broken by id
+        first = Article.objects.order_by("id").first()
+        Article.objects.filter(pk__lte=first.pk + 3).update(
+            created_at=first.created_at
+        )
+        cls.expected = list(
+            Article.objects.order_by("-created_at", "-id").values_list(
+                "slug", flat=True
+            )
+        )
+
+    def walk(self, url, direction):
+        slugs = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            self.assertFalse(any("COUNT(" in query["sql"] for query in queries))
+            page = [article["slug"] for article in response.data["results"]]
+            slugs = slugs + page if direction == "next" else page + slugs
+            last_url, url = url, response.data[direction]
+        return slugs, last_url
+
+    def test_walk_forward_and_back(self):
+        slugs, last_url = self.walk("/api/articles/?cursor=&limit=2", "next")
+        self.assertEqual(slugs, self.expected)
+
+        response = self.client.get(last_url)
+        slugs, _ = self.walk(response.data["previous"], "previous")
+        self.assertEqual(slugs, self.expected[:6])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/articles/?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+    def test_negative_offset_or_limit(self):
+        # Such requests fall back to the first page by page number
+        for query in ["offset=-1", "offset=2&limit=-5", "offset=2&limit=0"]:
+            response = self.client.get(f"/api/articles/?{query}")
+            self.assertEqual(response.status_code, 200)
+            slugs = [article["slug"] for article in response.data["results"]]
+            self.assertEqual(slugs, self.expected)
+
+
+class CachedCountTests(APITestCase):
+    """Paginated totals are cached per filter and invalidated by writes"""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(
+            email="viewer@example.com", username="viewer", password="password"
+        ).profile
+        self.author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        ).profile
+        self.article = self.create_article("First")
+
+    def create_article(self, title):
+        return Article.objects.create(
+            title=title,
+            description="description",
+            body="body",
+            author=self.author,
+        )
+
+    def get_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        counted = any("COUNT(" in query["sql"] for query in queries)
+        return response.data["count"], counted
+
+    def test_total_is_cached_until_an_article_is_created(self):
+        self.assertEqual(self.get_count("/api/articles/"), (1, True))
+        self.assertEqual(self.get_count("/api/articles/?page=1"), (1, False))
+
+        self.create_article("Second")
+        self.assertEqual(self.get_count("/api/articles/"), (2, True))
+
+    def test_per_process_cache_keeps_totals_briefly(self):
+        self.get_count("/api/articles/")
+
+        # As a write made on another worker, whose cache this one cannot see
+        Article.objects.bulk_create(
+            [Article(title="Second", slug="second", author=self.author)]
+        )
+        self.assertEqual(self.get_count("/api/articles/"), (1, False))
+
+        later = time.time() + settings.ARTICLE_COUNT_LOCAL_CACHE_TIMEOUT + 1
+        with mock.patch("time.time", return_value=later):
+            self.assertEqual(self.get_count("/api/articles/"), (2, True))
+
+    def test_favorite_invalidates_only_that_user(self):
+        url = "/api/articles/?favorited=viewer"
+        self.assertEqual(self.get_count(url), (0, True))
+        self.get_count("/api/articles/")
+
+        self.article.favorited_by.add(self.viewer)
+        self.assertEqual(self.get_count(url), (1, True))
+        self.assertEqual(self.get_count("/api/articles/"), (1, False))
+
+    def test_follow_invalidates_the_feed(self):
+        self.client.force_authenticate(self.viewer.user)
+        self.assertEqual(self.get_count("/api/articles/feed/"), (0, True))
+
+        self.author.followers.add(self.viewer)
+        self.assertEqual(self.get_count("/api/articles/feed/"), (1, True))
+
+    def test_large_totals_are_estimated(self):
+        with mock.patch(
+            "apps.articles.counting.estimate_count", return_value=500_000
+        ):
+            response = self.client.get("/api/articles/?limit=5&offset=0")
+
+        self.assertEqual(response.data["count"], 500_000)
+        self.assertTrue(response.data["count_approximate"])
+
+    def test_postgresql_plans_are_parsed(self):
+        # Captured from Django 5.2 on PostgreSQL 16 through psycopg 3.2
+        plan = (
+            '[{"Plan": {"Node Type": "Seq Scan", "Parallel Aware": false, '
+            '"Async Capable": false, "Relation Name": "articles_article", '
+            '"Alias": "articles_article", "Startup Cost": 0.0, '
+            '"Total Cost": 12.0, "Plan Rows": 200, "Plan Width": 8}}]'
+        )
+        queryset = Article.objects.all()
+        with mock.patch(
+            "apps.articles.counting.can_estimate", return_value=True
+        ):
+            # Other driver versions return the object inside the list
+            for explained in [plan, plan[1:-1]]:
+                with mock.patch.object(
+                    type(queryset), "explain", return_value=explained
+                ):
+                    self.assertEqual(counting.estimate_count(queryset), 200)
+
+
+class MaterializedFeedTests(APITestCase):
+    """The feed table must match the follow graph at all times"""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(
+            email="reader@example.com", username="reader", password="password"
+        ).profile
+        self.author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        ).profile
+        self.old = self.create_article("Written before the follow")
+        self.client.force_authenticate(self.reader.user)
+
+    def create_article(self, title):
+        return Article.objects.create(
+            title=title,
+            description="description",
+            body="body",
+            author=self.author,
+        )
+
+    def get_feed(self):
+        response = self.client.get("/api/articles/feed/")
+        return [article["slug"] for article in response.data["results"]]
+
+    def test_follow_backfills_and_new_articles_fan_out(self):
+        self.author.followers.add(self.reader)
+        new = self.create_article("Written after the follow")
+
+        self.assertEqual(self.get_feed(), [new.slug, self.old.slug])
+        with override_settings(FEED_MATERIALIZED=False):
+            self.assertEqual(self.get_feed(), [new.slug, self.old.slug])
+
+    def test_unfollow_and_delete_trim_the_feed(self):
+        self.reader.following.add(self.author)
+        self.old.delete()
+        self.assertFalse(FeedEntry.objects.exists())
+
+        self.create_article("Another")
+        self.reader.following.clear()
+        self.assertEqual(self.get_feed(), [])
+
+    def test_backfill_command_rebuilds_feeds(self):
+        self.author.followers.add(self.reader)
+        FeedEntry.objects.all().delete()
+
+        call_command("backfill_feed", stdout=StringIO())
+        self.assertEqual(self.get_feed(), [self.old.slug])
+
+
+class TagCloudTests(APITestCase):
+    """Tag popularity is maintained on write and served with an ETag"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        )
+        self.client.force_authenticate(self.author)
+
+    def create_article(self, tags):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/articles/",
+                {
+                    "title": f"Tagged {tags[0]}",
+                    "description": "d",
+                    "body": "b",
+                    "tags": tags,
+                },
+                format="json",
+            )
+        return response.data["slug"]
+
+    def get_counts(self):
+        return dict(Tag.objects.values_list("name", "articles_count"))
+
+    def test_counts_follow_article_writes(self):
+        first = self.create_article(["python", "django"])
+        self.create_article(["python"])
+        self.assertEqual(self.get_counts(), {"python": 2, "django": 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/api/articles/{first}/", {"tags": ["rust"]}, format="json"
+            )
+        self.assertEqual(
+            self.get_counts(), {"python": 1, "django": 0, "rust": 1}
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/articles/{first}/")
+        self.assertEqual(
+            self.get_counts(), {"python": 1, "django": 0, "rust": 0}
+        )
+
+    def test_tag_writes_do_not_grow_with_tag_count(self):
+        Tag.objects.create(name="existing")
+
+        def count_queries(tags):
+            with CaptureQueriesContext(connection) as queries:
+                self.create_article(tags + ["existing", tags[0]])
+            return len(queries)
+
+        few = count_queries([f"few-{i}" for i in range(2)])
+        many = count_queries([f"many-{i}" for i in range(20)])
+        self.assertEqual(few, many)
+        self.assertEqual(Tag.objects.get(name="existing").articles_count, 2)
+        self.assertEqual(Tag.objects.get(name="many-0").articles_count, 1)
+
+    def test_unchanged_cloud_is_not_modified(self):
+        self.create_article(["python"])
+        response = self.client.get("/api/tags/")
+        self.assertEqual(response.data, {"tags": ["python"]})
+
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        self.create_article(["django", "django-rest"])
+        response = self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["tags"], ["django", "django-rest", "python"]
+        )
+
+    def test_cloud_expires(self):
+        self.create_article(["python"])
+        self.client.get("/api/tags/")
+
+        # As a write made on another worker, whose cache this one cannot see
+        Tag.objects.create(name="django", articles_count=1)
+        response = self.client.get("/api/tags/")
+        self.assertEqual(response.data["tags"], ["python"])
+
+        later = time.time() + settings.TAG_CLOUD_CACHE_TIMEOUT + 1
+        with mock.patch("time.time", return_value=later):
+            response = self.client.get("/api/tags/")
+        self.assertEqual(response.data["tags"], ["django", "python"])
+
+
+class SlugAllocationTests(TestCase):
+    """Slugs are allocated in a bounded number of queries and retried"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        ).profile
+
+    def create_article(self, title):
+        return Article.objects.create(
+            title=title,
+            description="description",
+            body="body",
+            author=self.author,
+        )
+
+    def test_repeated_titles_get_counters(self):
+        slugs = [self.create_article("Hello World").slug for _ in range(3)]
+        self.create_article("Hello World Again")
+        self.assertEqual(
+            slugs, ["hello-world", "hello-world-1", "hello-world-2"]
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            article = self.create_article("Hello World")
+        lookups = [
+            query
+            for query in queries
+            if query["sql"].startswith('SELECT "articles_article"."slug"')
+        ]
+        self.assertEqual(article.slug, "hello-world-3")
+        self.assertEqual(len(lookups), 1)
+
+    def test_bare_slug_is_used_when_free(self):
+        Article.objects.bulk_create(
+            [Article(title="Hello", slug="hello-2024", author=self.author)]
+        )
+        self.assertEqual(self.create_article("Hello").slug, "hello")
+
+    def test_freed_slugs_are_reused(self):
+        articles = [self.create_article("Hello") for _ in range(3)]
+        articles[1].delete()
+        self.assertEqual(self.create_article("Hello").slug, "hello-1")
+
+        articles[0].delete()
+        self.assertEqual(self.create_article("Hello").slug, "hello")
+
+    def test_unchanged_title_skips_slug_work(self):
+        article = Article.objects.get(pk=self.create_article("Stable").pk)
+        article.body = "edited"
+
+        with CaptureQueriesContext(connection) as queries:
+            article.save()
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]["sql"].startswith("UPDATE"))
+
+    def test_retitle_keeps_own_slug_free(self):
+        article = self.create_article("Retitled")
+        article.title = "RETITLED"
+        article.save()
+        self.assertEqual(article.slug, "retitled")
+
+    def test_lost_race_allocates_again(self):
+        self.create_article("Raced")
+        allocate_slug = Article.allocate_slug
+        results = iter(["raced", None])
+
+        def stale_allocation(article):
+            # The first allocation ignores the existing row, as a concurrent
+            # request that has not seen it yet would
+            return next(results) or allocate_slug(article)
+
+        with mock.patch.object(Article, "allocate_slug", stale_allocation):
+            article = self.create_article("Raced")
+        self.assertEqual(article.slug, "raced-1")
+
+
+class ConditionalGetTests(APITestCase):
+    """Article responses carry validators that are cheap and viewer-aware"""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(
+            email="viewer@example.com", username="viewer", password="password"
+        )
+        self.other = User.objects.create_user(
+            email="other@example.com", username="other", password="password"
+        )
+        self.article = Article.objects.create(
+            title="Cached",
+            description="description",
+            body="body",
+            author=self.other.profile,
+        )
+        self.url = f"/api/articles/{self.article.slug}/"
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_detail_is_not_modified_until_favorited(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.revalidate(self.url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        self.article.favorited_by.add(self.other.profile)
+        self.assertEqual(self.revalidate(self.url, etag).status_code, 200)
+
+    def test_validators_depend_on_the_viewer(self):
+        anonymous = self.client.get(self.url)["ETag"]
+        self.client.force_authenticate(self.viewer)
+        viewer = self.client.get(self.url)["ETag"]
+        self.assertNotEqual(anonymous, viewer)
+
+        self.other.profile.followers.add(self.viewer.profile)
+        self.assertEqual(self.revalidate(self.url, viewer).status_code, 200)
+
+    def test_author_edits_change_the_validators(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.other.profile.bio = "New bio"
+        self.other.profile.save()
+        self.assertEqual(self.revalidate(self.url, etag).status_code, 200)
+
+    def test_anonymous_detail_honours_if_modified_since(self):
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_is_not_modified_before_serialization(self):
+        for url in ["/api/articles/", "/api/articles/?cursor="]:
+            etag = self.client.get(url)["ETag"]
+            with mock.patch.object(
+                ArticleSerializer, "to_representation"
+            ) as to_representation:
+                response = self.revalidate(url, etag)
+            self.assertEqual(response.status_code, 304)
+            to_representation.assert_not_called()
+
+        Article.objects.create(
+            title="New", description="d", body="b", author=self.other.profile
+        )
+        self.assertEqual(
+            self.revalidate("/api/articles/", etag).status_code, 200
+        )
+
+
+class FragmentCacheTests(APITestCase):
+    """Shared article fragments are reused and overlaid per viewer"""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(
+            email="viewer@example.com", username="viewer", password="password"
+        )
+        self.author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        ).profile
+        self.article = Article.objects.create(
+            title="Fragment",
+            description="description",
+            body="body",
+            author=self.author,
+        )
+        self.author.followers.add(self.viewer.profile)
+        self.article.favorited_by.add(self.viewer.profile)
+
+    def get_article(self):
+        response = self.client.get("/api/articles/")
+        return response.data["results"][0]
+
+    def test_hits_skip_field_serialization_and_keep_overlays(self):
+        anonymous = self.get_article()
+        self.client.force_authenticate(self.viewer)
+
+        with mock.patch(
+            "rest_framework.serializers.ModelSerializer.to_representation"
+        ) as to_representation:
+            viewer = self.get_article()
+        to_representation.assert_not_called()
+
+        self.assertFalse(anonymous["favorited"])
+        self.assertFalse(anonymous["author"]["following"])
+        self.assertTrue(viewer["favorited"])
+        self.assertTrue(viewer["author"]["following"])
+        self.assertEqual(viewer["favorites_count"], 1)
+
+    def test_writes_invalidate_fragments(self):
+        self.get_article()
+
+        self.article.favorited_by.add(self.author)
+        self.assertEqual(self.get_article()["favorites_count"], 2)
+
+        self.article.tags.add(Tag.objects.create(name="cached"))
+        self.assertEqual(self.get_article()["tags"], ["cached"])
+
+        self.author.user.username = "renamed"
+        self.author.user.save()
+        self.assertEqual(self.get_article()["author"]["username"], "renamed")
+
+
+class SearchTests(APITestCase):
+    """`?q=` returns ranked matches and follows article writes"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        ).profile
+        self.in_title = self.create_article("Django signals", "Body text")
+        self.in_body = self.create_article("Other", "All about django signals")
+        self.unrelated = self.create_article("Gardening", "Tomatoes")
+
+    def create_article(self, title, body):
+        return Article.objects.create(
+            title=title,
+            description="description",
+            body=body,
+            author=self.author,
+        )
+
+    def search(self, query, params=""):
+        response = self.client.get(f"/api/articles/?q={query}{params}")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def slugs(self, data):
+        return [article["slug"] for article in data["results"]]
+
+    def test_title_matches_rank_first(self):
+        data = self.search("django signals")
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(
+            self.slugs(data), [self.in_title.slug, self.in_body.slug]
+        )
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.slugs(self.search("django tomatoes")), [])
+        self.assertEqual(self.slugs(self.search("'\"*")), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(self.search("tomatoes")["count"], 1)
+
+        self.unrelated.body = "Cucumbers"
+        self.unrelated.save()
+        self.assertEqual(self.search("tomatoes")["count"], 0)
+        self.assertEqual(
+            self.slugs(self.search("cucumbers")), [self.unrelated.slug]
+        )
+
+        self.unrelated.delete()
+        self.assertEqual(self.search("cucumbers")["count"], 0)
+
+    def test_pagination_modes(self):
+        data = self.search("django", "&limit=1&offset=1")
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(self.slugs(data), [self.in_body.slug])
+
+        data = self.search("django", "&page=1")
+        self.assertEqual(len(data["results"]), 2)
+
+        # Cursor pages walk the matches newest first
+        data = self.search("django", "&cursor=&limit=1")
+        self.assertEqual(self.slugs(data), [self.in_body.slug])
+        data = self.client.get(data["next"]).data
+        self.assertEqual(self.slugs(data), [self.in_title.slug])
+        self.assertIsNone(data["next"])
+
+
+class QueryPlanTests(TestCase):
+    """Every endpoint's queryset must stay on its indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        dataset.seed(**plans.DATASET)
+        cls.querysets = plans.get_querysets(plans.get_sample())
+
+    def test_plans_use_indexes(self):
+        costs, problems = plans.check(
+            self.querysets, plans.load_baseline(connection.vendor)
+        )
+        self.assertEqual(problems, [])
+
+    def test_regressions_are_reported(self):
+        querysets = {
+            "article-list": Article.objects.order_by("body")[:20],
+            "article-detail": Article.objects.filter(body="body"),
+        }
+        _, problems = plans.check(querysets, {})
+        self.assertIn(
+            "article-list: sorts rows instead of reading an index", problems
+        )
+        self.assertIn(
+            "article-detail: sequential scan on articles_article", problems
+        )
+
+    def test_cost_baseline(self):
+        costs, _ = plans.check(self.querysets, {})
+        if not costs:
+            self.skipTest(f"{connection.vendor} does not report plan costs")
+
+        # Without a stored cost, test_plans_use_indexes cannot catch a
+        # regression; see `check_query_plans --seed --update-baseline`
+        baseline = plans.load_baseline(connection.vendor)
+        self.assertEqual(sorted(baseline), sorted(costs))
+
+        baseline = {name: cost / 2 for name, cost in costs.items()}
+        _, problems = plans.check(self.querysets, baseline)
+        self.assertTrue(all("exceeds baseline" in p for p in problems))
+        self.assertEqual(len(problems), len(costs))
+
+
+@override_settings(METRICS_TOKEN="scrape")
+class InstrumentationTests(APITestCase):
+    """Requests report their queries and timings, aggregated per view"""
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+        self.viewer = User.objects.create_user(
+            email="viewer@example.com", username="viewer", password="password"
+        )
+        self.article = Article.objects.create(
+            title="Instrumented",
+            description="description",
+            body="body",
+            author=self.viewer.profile,
+        )
+
+    def get_metrics(self):
+        response = self.client.get(
+            "/api/metrics", HTTP_AUTHORIZATION="Bearer scrape"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_metrics_require_the_token(self):
+        for authorization in ["", "Bearer wrong"]:
+            response = self.client.get(
+                "/api/metrics", HTTP_AUTHORIZATION=authorization
+            )
+            self.assertEqual(response.status_code, 401)
+
+        with override_settings(METRICS_TOKEN=""):
+            response = self.client.get(
+                "/api/metrics", HTTP_AUTHORIZATION="Bearer "
+            )
+        self.assertEqual(response.status_code, 404)
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/articles/")
+
+        timing = response["Server-Timing"]
+        self.assertIn(f'desc="{len(queries)}"', timing)
+        self.assertRegex(timing, r"db;dur=[\d.]+")
+        self.assertRegex(timing, r"serialize;dur=[\d.]+")
+        self.assertRegex(timing, r"total;dur=[\d.]+")
+
+    def test_histograms_are_keyed_by_action(self):
+        self.client.force_authenticate(self.viewer)
+        self.client.get("/api/articles/")
+        self.client.get("/api/articles/")
+        self.client.get("/api/articles/feed/")
+        self.client.post(f"/api/articles/{self.article.slug}/favorite/")
+
+        body = self.get_metrics()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn(
+            'http_request_duration_seconds_count{view="article-list",'
+            'method="GET"} 2',
+            body,
+        )
+        self.assertIn('view="article-feed",method="GET"', body)
+        self.assertIn('view="article-favorite",method="POST"', body)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get("/api/articles/")
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.assertNotIn("article-list", metrics.registry.render())
+
+    def test_pool_statistics_are_exposed(self):
+        with mock.patch.object(metrics, "get_pools", return_value=[]):
+            self.assertNotIn("db_pool", self.get_metrics())
+
+        pool = mock.Mock()
+        pool.get_stats.return_value = {
+            "pool_min": 2,
+            "pool_max": 4,
+            "pool_size": 3,
+            "pool_available": 1,
+            "requests_num": 40,
+            "requests_queued": 5,
+            "requests_wait_ms": 1500,
+            "connections_num": 7,
+        }
+        with mock.patch.object(
+            metrics, "get_pools", return_value=[("default", pool)]
+        ):
+            body = self.get_metrics()
+
+        self.assertIn("# TYPE db_pool_connections_in_use gauge", body)
+        self.assertIn('db_pool_connections_in_use{database="default"} 2', body)
+        self.assertIn('db_pool_waits_total{database="default"} 5', body)
+        self.assertIn(
+            'db_pool_wait_seconds_total{database="default"} 1.5', body
+        )
+        self.assertIn(
+            'db_pool_connections_recycled_total{database="default"} 4', body
+        )
+        self.assertIn('db_pool_timeouts_total{database="default"} 0', body)
+
+
+class AsyncReadParityTests(APITestCase):
+    """The async read views answer exactly as the sync ones"""
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(
+            email="viewer@example.com", username="viewer", password="password"
+        )
+        python = Tag.objects.create(name="python")
+        for i in range(5):
+            author = User.objects.create_user(
+                email=f"author{i}@example.com",
+                username=f"author{i}",
+                password="password",
+            ).profile
+            article = Article.objects.create(
+                title=f"Async article {i}",
+                description="description",
+                body="body",
+                author=author,
+            )
+            Comment.objects.create(
+                author=author, article=article, body=f"comment {i}"
+            )
+            if i % 2:
+                author.followers.add(self.viewer.profile)
+                article.favorited_by.add(self.viewer.profile)
+                article.tags.add(python)
+        self.article = article
+
+    def get(self, url, **headers):
+        cache.clear()
+        sync_response = self.client.get(url, **headers)
+        cache.clear()
+        with self.settings(ROOT_URLCONF=__name__):
+            async_response = self.client.get(url, **headers)
+            # Resolved lazily, so within the same URLconf
+            view = async_response.resolver_match.func
+        self.assertTrue(iscoroutinefunction(view), url)
+
+        self.assertEqual(
+            async_response.status_code, sync_response.status_code, url
+        )
+        for header in ("ETag", "Last-Modified", "Vary", "Content-Type"):
+            self.assertEqual(
+                async_response.get(header), sync_response.get(header), url
+            )
+        if sync_response.content:
+            self.assertEqual(async_response.json(), sync_response.json(), url)
+        return async_response
+
+    def assert_parity(self, urls):
+        for url in urls:
+            response = self.get(url)
+            if response.has_header("ETag"):
+                response = self.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(response.status_code, 304, url)
+
+    def test_anonymous_reads(self):
+        slug = self.article.slug
+        self.assert_parity(
+            [
+                "/api/articles/",
+                "/api/articles/?page=2&limit=2",
+                "/api/articles/?limit=2&offset=1",
+                "/api/articles/?cursor=&limit=2",
+                "/api/articles/?tag=python",
+                "/api/articles/?author=author1",
+                "/api/articles/?favorited=viewer",
+                "/api/articles/?q=async",
+                f"/api/articles/{slug}/",
+                "/api/tags/",
+                "/api/profiles/author1/",
+                f"/api/articles/{slug}/comments/",
+                f"/api/articles/{slug}/comments/?cursor=&limit=1",
+            ]
+        )
+
+    def test_authenticated_reads(self):
+        self.client.force_authenticate(self.viewer)
+        slug = self.article.slug
+        self.assert_parity(
+            [
+                "/api/articles/",
+                "/api/articles/feed/",
+                "/api/articles/feed/?cursor=",
+                f"/api/articles/{slug}/",
+                "/api/profiles/author1/",
+                "/api/profiles/author2/",
+                f"/api/articles/{slug}/comments/",
+            ]
+        )
+
+        # Users built from token claims come with their profile
+        self.client.force_authenticate(None)
+        token = RefreshToken.for_user(self.viewer).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assert_parity(["/api/articles/", "/api/articles/feed/"])
+
+    @override_settings(COMMENTS_PAGINATED=False)
+    def test_unpaginated_comments(self):
+        self.assert_parity([f"/api/articles/{self.article.slug}/comments/"])
+
+    def test_errors(self):
+        self.assert_parity(
+            [
+                "/api/articles/missing/",
+                "/api/articles/?page=9",
+                "/api/articles/?cursor=invalid",
+                "/api/articles/feed/",
+                "/api/profiles/missing/",
+                "/api/articles/missing/comments/?cursor=bad",
+            ]
+        )
+
+    def test_writes_stay_sync(self):
+        self.client.force_authenticate(self.viewer)
+        with self.settings(ROOT_URLCONF=__name__):
+            response = self.client.post(
+                f"/api/articles/{self.article.slug}/comments/",
+                {"body": "Written"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["body"], "Written")
+
+    def test_server_timing_counts_async_queries(self):
+        with self.settings(ROOT_URLCONF=__name__):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get("/api/articles/")
+        self.assertGreater(len(queries), 0)
+        self.assertIn(f'desc="{len(queries)}"', response["Server-Timing"])
+
+
+class ArticleBatchTests(APITestCase):
+    """Several articles are fetched, favorited or unfavorited at once"""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(
+            email="viewer@example.com", username="viewer", password="password"
+        )
+        self.articles = [
+            Article.objects.create(
+                title=f"Batch {i}",
+                description="description",
+                body="body",
+                author=self.viewer.profile,
+            )
+            for i in range(5)
+        ]
+        self.slugs = [article.slug for article in self.articles]
+        self.client.force_authenticate(self.viewer)
+
+    def fetch(self, slugs):
+        query = "&".join(f"slug={slug}" for slug in slugs)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/articles/?{query}")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("COUNT(" in query["sql"] for query in queries))
+        return len(queries), [a["slug"] for a in response.data]
+
+    def through_writes(self, queries):
+        return [
+            query["sql"].split()[0]
+            for query in queries
+            if "articles_article_favorited_by" in query["sql"]
+            and query["sql"].startswith(("INSERT", "DELETE"))
+        ]
+
+    def test_fetch_by_slugs(self):
+        few_queries, few = self.fetch(self.slugs[:2])
+        many_queries, many = self.fetch([*self.slugs, "missing"])
+        self.assertEqual(sorted(few), sorted(self.slugs[:2]))
+        self.assertEqual(sorted(many), sorted(self.slugs))
+        self.assertEqual(few_queries, many_queries)
+
+        query = "&".join(["slug=s"] * 101)
+        response = self.client.get(f"/api/articles/?{query}")
+        self.assertEqual(response.status_code, 400)
+
+    def test_fetch_more_than_a_page(self):
+        Article.objects.bulk_create(
+            Article(
+                title=f"Extra {i}",
+                slug=f"extra-{i}",
+                author=self.viewer.profile,
+            )
+            for i in range(25)
+        )
+        slugs = [*self.slugs, *(f"extra-{i}" for i in range(25))]
+        _, fetched = self.fetch(slugs)
+        self.assertEqual(sorted(fetched), sorted(slugs))
+
+    def test_bulk_favorite_and_unfavorite(self):
+        slugs = self.slugs[3:0:-1]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/articles/favorites/", {"slugs": slugs}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a["slug"] for a in response.data], slugs)
+        self.assertTrue(all(a["favorited"] for a in response.data))
+        self.assertEqual(self.through_writes(queries), ["INSERT"])
+
+        # Favoriting again changes nothing
+        self.client.post(
+            "/api/articles/favorites/", {"slugs": slugs}, format="json"
+        )
+        counts = dict(Article.objects.values_list("slug", "favorites_count"))
+        self.assertEqual([counts[slug] for slug in self.slugs], [0, 1, 1, 1, 0])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(
+                "/api/articles/favorites/", {"slugs": slugs}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(a["favorited"] for a in response.data))
+        self.assertEqual(self.through_writes(queries), ["DELETE"])
+        self.assertFalse(Article.objects.filter(favorites_count__gt=0).exists())
+
+    def test_unknown_slugs_change_nothing(self):
+        response = self.client.post(
+            "/api/articles/favorites/",
+            {"slugs": [self.slugs[0], "missing"]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("missing", response.data["detail"])
+        self.assertFalse(self.viewer.profile.favorited_articles.exists())
+
+        response = self.client.post(
+            "/api/articles/favorites/", {"slugs": []}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(
+            "/api/articles/favorites/", {"slugs": self.slugs}, format="json"
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(REPLICA_DATABASES=["replica"], REPLICA_PIN_SECONDS=30)
+class ReplicaRoutingTests(APITestCase):
+    """
+    Safe requests read from the replica, and clients that write read their
+    writes from the primary; the replica database here is never copied to
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(
+            email="viewer@example.com", username="viewer", password="password"
+        )
+        self.article = Article.objects.create(
+            title="Replicated",
+            description="description",
+            body="body",
+            author=self.viewer.profile,
+        )
+        self.client.force_authenticate(self.viewer)
+
+    def list_slugs(self):
+        response = self.client.get("/api/articles/")
+        self.assertEqual(response.status_code, 200)
+        return [article["slug"] for article in response.data["results"]]
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.list_slugs(), [])
+        response = self.client.get(f"/api/articles/{self.article.slug}/")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_writers_read_from_the_primary(self):
+        response = self.client.post(
+            f"/api/articles/{self.article.slug}/favorite/"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 30)
+        self.assertEqual(self.list_slugs(), [self.article.slug])
+
+        # Once the cookie expires
+        del self.client.cookies[PIN_COOKIE]
+        self.assertEqual(self.list_slugs(), [])
+
+    def test_writes_go_to_the_primary(self):
+        response = self.client.post(
+            "/api/articles/",
+            {"title": "Written", "description": "d", "body": "b"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Article.objects.filter(title="Written").exists())
+        self.assertFalse(
+            Article.objects.using("replica").filter(title="Written").exists()
+        )
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        response = self.client.post(
+            f"/api/articles/{self.article.slug}/favorite/"
+        )
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.list_slugs(), [self.article.slug])
+
+    def test_queries_outside_requests_use_the_primary(self):
+        self.assertEqual(Article.objects.all().db, "default")
+        self.assertEqual(Article.objects.get().pk, self.article.pk)
+
+
+class DatasetCommandTests(TestCase):
+    """The seeder writes consistent data the benchmark can run against"""
+
+    def test_seed_and_benchmark(self):
+        out = StringIO()
+        call_command(
+            "seed_dataset",
+            "--users=30",
+            "--articles=100",
+            "--follows-per-user=5",
+            stdout=out,
+        )
+        rows = json.loads(out.getvalue())["rows"]
+        self.assertEqual(rows["users"], 30)
+        self.assertEqual(Article.objects.count(), 100)
+        # No profile signal ran, yet every user has exactly one profile
+        self.assertEqual(Profile.objects.count(), 30)
+
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertNotIn("stored", out.getvalue())
+        self.assertTrue(FeedEntry.objects.exists())
+
+        out = StringIO()
+        call_command(
+            "benchmark_endpoints", "--requests=2", "--warmup=0", stdout=out
+        )
+        endpoints = json.loads(out.getvalue())["endpoints"]
+        self.assertIn("article-feed", endpoints)
+        for result in endpoints.values():
+            self.assertEqual(
+                set(result),
+                {"requests", "p50_ms", "p99_ms", "queries", "peak_memory_kb"},
+            )
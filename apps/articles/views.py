@@ -1,97 +1,42 @@
 from typing import cast
-from django.db.models import Count
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import action
 
+from api.asyncviews import AsyncReadMixin, alist
+
+from .conditional import get_not_modified_response, make_etag, set_validators
 from .models import Article, Tag
-from .serializers import ArticleSerializer
+from .pagination import FlexiblePagination
+from .search import search
+from .serializers import (
+    MAX_SLUGS,
+    ArticleSerializer,
+    ArticleSlugsSerializer,
+    aget_favorited_ids,
+    get_favorited_ids,
+)
+from .signals import TAG_CLOUD_CACHE_KEY
 
 from ..authentication.models import User
-
-
-class FlexiblePagination(PageNumberPagination):
-    """
-    Supports both page/limit and limit/offset pagination styles
-    """
-
-    page_size = 20
-    page_size_query_param = "limit"
-    max_page_size = 100
-
-    def paginate_queryset(self, queryset, request, view=None):
-        # Check if offset is provided (LimitOffset style)
-        offset = request.query_params.get("offset")
-        limit = request.query_params.get("limit", self.page_size)
-
-        if offset is not None:
-            # Use limit/offset pagination
-            try:
-                offset = int(offset)
-                limit = int(limit)
-                limit = min(limit, self.max_page_size)  # Respect max limit
-
-                self.limit = limit
-                self.offset = offset
-                self.count = queryset.count()
-                self.request = request
-
-                return list(queryset[offset : offset + limit])
-            except (ValueError, TypeError):
-                pass
-
-        # Fall back to page/page_size pagination
-        return super().paginate_queryset(queryset, request, view)
-
-    def get_paginated_response(self, data):
-        # If we used offset/limit style
-        if hasattr(self, "offset"):
-            return Response(
-                {
-                    "count": self.count,
-                    "next": self.get_next_link(),
-                    "previous": self.get_previous_link(),
-                    "results": data,
-                }
-            )
-
-        # Otherwise use standard page response
-        return super().get_paginated_response(data)
-
-    def get_next_link(self):
-        if hasattr(self, "offset"):
-            if self.offset + self.limit >= self.count:
-                return None
-
-            url = self.request.build_absolute_uri()
-            offset = self.offset + self.limit
-            return f"{url.split('?')[0]}?limit={self.limit}&offset={offset}"
-
-        return super().get_next_link()
-
-    def get_previous_link(self):
-        if hasattr(self, "offset"):
-            if self.offset <= 0:
-                return None
-
-            url = self.request.build_absolute_uri()
-            offset = max(0, self.offset - self.limit)
-            return f"{url.split('?')[0]}?limit={self.limit}&offset={offset}"
-
-        return super().get_previous_link()
+from ..users.models import Profile
+from ..users.serializers import aget_following_ids, get_following_ids
 
 
 # Create your views here.
-class ArticleViewSet(ModelViewSet):
+class ArticleViewSet(AsyncReadMixin, ModelViewSet):
     """
     A simple ViewSet for viewing, editing, and deleting articles.
     """
 
-    queryset = Article.objects.select_related("author").prefetch_related(
-        "tags", "favorited_by"
+    queryset = Article.objects.select_related("author__user").prefetch_related(
+        "tags"
     )
     serializer_class = ArticleSerializer
     pagination_class = FlexiblePagination
@@ -99,27 +44,48 @@ class ArticleViewSet(ModelViewSet):
     lookup_field = "slug"
 
     def get_queryset(self):
-        queryset = (
-            super()
-            .get_queryset()
-            .annotate(favorites_count=Count("favorited_by"))
-            .order_by("-created_at")
-        )
+        queryset = super().get_queryset().order_by("-created_at")
 
+        slugs = self.request.GET.getlist("slug")
         tags = self.request.GET.getlist("tag")
+        author = self.request.GET.get("author")
+        favorited = self.request.GET.get("favorited")
+        query = self.request.GET.get("q", "").strip()
+        # Identifies this filter combination to the pagination count cache
+        self.count_scope = {
+            "tags": sorted(tags),
+            "author": author,
+            "favorited": favorited,
+            "q": query,
+        }
+
+        if slugs:
+            # Several articles in one query, e.g. to prefetch linked ones
+            if len(slugs) > MAX_SLUGS:
+                raise ValidationError(
+                    {"slug": [f"At most {MAX_SLUGS} slugs per request."]}
+                )
+            queryset = queryset.filter(slug__in=slugs)
+
         if tags:
             queryset = queryset.filter(tags__name__in=tags).distinct()
 
-        author = self.request.GET.get("author")
         if author:
-            queryset = queryset.filter(author__user__username=author).distinct()
+            # One author per article, so no DISTINCT, which would keep
+            # PostgreSQL from reading the (author, created_at) index in order
+            queryset = queryset.filter(author__user__username=author)
 
-        favorited = self.request.GET.get("favorited")
         if favorited:
             queryset = queryset.filter(
                 favorited_by__user__username=favorited
             ).distinct()
 
+        if query:
+            # Best matches first; cursor pages keep to recency order
+            queryset = search(queryset, query).order_by(
+                "-search_rank", "-created_at", "-id"
+            )
+
         return queryset
 
     def get_permissions(self):
@@ -127,27 +93,167 @@ class ArticleViewSet(ModelViewSet):
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
+    def get_serializer_context(self):
+        # Viewer flags already resolved while computing validators
+        context = super().get_serializer_context()
+        context.update(getattr(self, "viewer_flags", {}))
+        return context
+
+    def get_viewer_flags(self, articles):
+        """The requesting user's favorites and follows among `articles`"""
+        authors = [article.author for article in articles]
+        return {
+            "favorited_ids": get_favorited_ids(self.request, articles),
+            "following_ids": get_following_ids(self.request, authors),
+        }
+
+    async def aget_viewer_flags(self, articles):
+        authors = [article.author for article in articles]
+        return {
+            "favorited_ids": await aget_favorited_ids(self.request, articles),
+            "following_ids": await aget_following_ids(self.request, authors),
+        }
+
+    def get_validators(self, articles, page=None):
+        """
+        Return the ETag and Last-Modified of a response listing `articles`
+
+        Both come from change markers loaded with the articles, so a client
+        with a current copy gets its 304 before anything is serialized.
+        """
+        request = self.request
+        etag = make_etag(
+            request.user.pk,
+            page,
+            [
+                (article.pk, article.changed_at, article.author.updated_at)
+                for article in articles
+            ],
+            sorted(self.viewer_flags["favorited_ids"]),
+            sorted(self.viewer_flags["following_ids"]),
+        )
+
+        # The viewer's own favorites and follows have no timestamp, and a
+        # deletion can shift older articles into a page, so Last-Modified is
+        # only exact for a single article seen anonymously
+        last_modified = None
+        if page is None and not request.user.is_authenticated:
+            last_modified = max(
+                max(article.changed_at, article.author.updated_at)
+                for article in articles
+            )
+
+        return etag, last_modified
+
+    def paginate_queryset(self, queryset):
+        # Fetches by slug return every article asked for, at most MAX_SLUGS,
+        # and skip the count, as each slug set would be its own cache entry
+        if self.request.GET.getlist("slug"):
+            return None
+        return super().paginate_queryset(queryset)
+
+    async def apaginate_queryset(self, queryset):
+        if self.request.GET.getlist("slug"):
+            return None
+        return await super().apaginate_queryset(queryset)
+
+    def list_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        articles = list(queryset) if page is None else page
+        self.viewer_flags = self.get_viewer_flags(articles)
+        return self.get_list_response(articles, page)
+
+    async def alist_response(self, queryset):
+        page = await self.apaginate_queryset(queryset)
+        articles = await alist(queryset) if page is None else page
+        self.viewer_flags = await self.aget_viewer_flags(articles)
+        return self.get_list_response(articles, page)
+
+    def get_list_response(self, articles, page):
+        """Answer with the loaded `articles`, without further queries"""
+        # Pagination links and totals, without the results
+        page_info = None
+        if page is not None:
+            page_info = self.get_paginated_response([]).data
+
+        etag, _ = self.get_validators(articles, page_info or {})
+        not_modified = get_not_modified_response(self.request, etag)
+        if not_modified:
+            return not_modified
+
+        serializer = self.get_serializer(articles, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        return set_validators(response, etag)
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.alist_response(
+            self.filter_queryset(self.get_queryset())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        article = self.get_object()
+        self.viewer_flags = self.get_viewer_flags([article])
+        return self.get_detail_response(article)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        article = await self.aget_object()
+        self.viewer_flags = await self.aget_viewer_flags([article])
+        return self.get_detail_response(article)
+
+    def get_detail_response(self, article):
+        etag, last_modified = self.get_validators([article])
+        not_modified = get_not_modified_response(
+            self.request, etag, last_modified
+        )
+        if not_modified:
+            return not_modified
+
+        serializer = self.get_serializer(article)
+        return set_validators(Response(serializer.data), etag, last_modified)
+
     def perform_create(self, serializer):
         """Create a new article with the current user's profile as author"""
         return serializer.save(author=getattr(self.request.user, "profile"))
 
+    def get_feed_queryset(self, profile):
+        """Articles by the authors `profile` follows, newest first"""
+        if settings.FEED_MATERIALIZED:
+            queryset = (
+                self.get_queryset().filter(feed_entries__reader=profile)
+                # Same order as `-id`, but on the entry so that the feed
+                # index returns it without a sort
+                .order_by(
+                    "-feed_entries__created_at", "-feed_entries__article_id"
+                )
+            )
+        else:
+            queryset = (
+                self.get_queryset().filter(author__followers=profile).distinct()
+            )
+        self.count_scope["feed"] = profile.pk
+        return queryset
+
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
     def feed(self, request):
         """Get articles from followed users"""
         user = cast(User, request.user)
-        queryset = (
-            self.get_queryset()
-            .filter(author__followers=getattr(user, "profile"))
-            .distinct()
-        )
-
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        profile = getattr(user, "profile")
+        return self.list_response(self.get_feed_queryset(profile))
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    async def afeed(self, request):
+        user = cast(User, request.user)
+        # Built from the token claims, unless they were outdated
+        if User.profile.is_cached(user):
+            profile = getattr(user, "profile")
+        else:
+            profile = await Profile.objects.aget(user=user)
+        return await self.alist_response(self.get_feed_queryset(profile))
 
     @action(
         detail=True,
@@ -171,24 +277,93 @@ class ArticleViewSet(ModelViewSet):
             article.favorited_by.add(profile)
         elif request.method == "DELETE":
             article.favorited_by.remove(profile)
+        article.refresh_from_db(fields=["favorites_count", "changed_at"])
 
         # return the updated article data
         serializer = self.get_serializer(article)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+    )
+    def favorites(self, request):
+        """Favorite or unfavorite several articles at once"""
+        serializer = ArticleSlugsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        slugs = serializer.validated_data["slugs"]
+        profile = getattr(request.user, "profile")
+
+        with transaction.atomic():
+            article_ids = dict(
+                Article.objects.filter(slug__in=slugs).values_list("slug", "pk")
+            )
+            missing = [slug for slug in slugs if slug not in article_ids]
+            if missing:
+                raise NotFound(
+                    f"No Article matches the slugs: {', '.join(missing)}."
+                )
+
+            # A single insert into, or delete from, the through table
+            if request.method == "POST":
+                profile.favorited_articles.add(*article_ids.values())
+            else:
+                profile.favorited_articles.remove(*article_ids.values())
+
+        # In the order they were sent
+        positions = {slug: position for position, slug in enumerate(slugs)}
+        articles = sorted(
+            self.get_queryset().filter(pk__in=article_ids.values()),
+            key=lambda article: positions[article.slug],
+        )
+        self.viewer_flags = self.get_viewer_flags(articles)
+        serializer = self.get_serializer(articles, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
-class TagViewSet(GenericViewSet):
+class TagViewSet(AsyncReadMixin, GenericViewSet):
     """
     A simple ViewSet for listing all tags.
     """
 
-    queryset = Tag.objects.annotate(articles_count=Count("articles")).order_by(
-        "-articles_count"
-    )
+    queryset = Tag.objects.order_by("-articles_count", "name")
     pagination_class = None
 
+    def get_tag_cloud(self):
+        """
+        Return the tag names and their ETag, cached until a count changes or
+        for `TAG_CLOUD_CACHE_TIMEOUT` seconds
+        """
+        cloud = cache.get(TAG_CLOUD_CACHE_KEY)
+        if cloud is None:
+            tag_names = list(self.get_queryset().values_list("name", flat=True))
+            cloud = self.set_tag_cloud(tag_names)
+        return cloud
+
+    async def aget_tag_cloud(self):
+        cloud = cache.get(TAG_CLOUD_CACHE_KEY)
+        if cloud is None:
+            tag_names = await alist(
+                self.get_queryset().values_list("name", flat=True)
+            )
+            cloud = self.set_tag_cloud(tag_names)
+        return cloud
+
+    def set_tag_cloud(self, tag_names):
+        cloud = (tag_names, make_etag(tag_names))
+        cache.set(TAG_CLOUD_CACHE_KEY, cloud, settings.TAG_CLOUD_CACHE_TIMEOUT)
+        return cloud
+
     def list(self, request, *args, **kwargs):
         """Override the list method to customize the response"""
-        queryset = self.get_queryset()
-        tag_names = list(queryset.values_list("name", flat=True))
-        return Response({"tags": tag_names})
+        return self.get_list_response(*self.get_tag_cloud())
+
+    async def alist(self, request, *args, **kwargs):
+        return self.get_list_response(*await self.aget_tag_cloud())
+
+    def get_list_response(self, tag_names, etag):
+        not_modified = get_not_modified_response(self.request, etag)
+        if not_modified:
+            return not_modified
+        return set_validators(Response({"tags": tag_names}), etag)
@@ -0,0 +1,159 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+from .tokens import claims_are_current, get_changed_at
+from ..users.models import Profile
+
+
+class UserCache:
+    """
+    Full user and profile rows per user id, kept in process memory for
+    `AUTH_USER_CACHE_TIMEOUT` seconds. Rows are stored as values and every
+    lookup builds new instances, so requests never share a mutable user.
+    """
+
+    max_size = 10_000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, user_id, changed_at):
+        """Return `(user, profile)`, or None when missing or outdated"""
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        expires, loaded_at, user_values, profile_values = entry
+        if expires < time.monotonic() or changed_at >= loaded_at:
+            return None
+        return build(User, user_values), build(Profile, profile_values)
+
+    def set(self, user, profile, timeout, loaded_at):
+        entry = (
+            time.monotonic() + timeout,
+            loaded_at,
+            get_values(user),
+            get_values(profile),
+        )
+        with self.lock:
+            if len(self.entries) >= self.max_size:
+                now = time.monotonic()
+                self.entries = {
+                    key: value
+                    for key, value in self.entries.items()
+                    if value[0] >= now
+                }
+            if len(self.entries) >= self.max_size:
+                self.entries.clear()
+            self.entries[user.pk] = entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+def get_values(instance):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    }
+
+
+def build(model, values):
+    """
+    Build a `model` instance as if loaded from the database; fields missing
+    from `values` are deferred and load on first access
+    """
+    field_names = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.attname in values
+    ]
+    return model.from_db(
+        router.db_for_read(model),
+        field_names,
+        [values[name] for name in field_names],
+    )
+
+
+def link(user, profile):
+    # Both sides of the one-to-one are cached, so `user.profile` and
+    # `profile.user` do not query
+    user.profile = profile
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds `request.user` and its profile from the
+    access token's claims (see tokens.py) instead of loading them. Only the
+    id, username and active flag are known; other fields load on access,
+    unless `AUTH_USER_CACHE_TIMEOUT` keeps the full rows in memory.
+
+    Tokens without claims, or issued before the user last changed, are
+    checked against the database like simplejwt does.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        # Revocation compares the password hash, which only the row has
+        if user_id is None or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        changed_at = get_changed_at(user_id)
+        if not claims_are_current(validated_token, changed_at):
+            return super().get_user(validated_token)
+        if not validated_token["is_active"]:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+
+        timeout = settings.AUTH_USER_CACHE_TIMEOUT
+        if timeout > 0:
+            return self.get_cached_user(user_id, changed_at, timeout)
+
+        user = build(
+            User,
+            {
+                api_settings.USER_ID_FIELD: user_id,
+                "username": validated_token["username"],
+                "is_active": True,
+            },
+        )
+        profile = build(
+            Profile,
+            {"id": validated_token["profile_id"], "user_id": user.pk},
+        )
+        return link(user, profile)
+
+    def get_cached_user(self, user_id, changed_at, timeout):
+        cached = user_cache.get(user_id, changed_at)
+        if cached is not None:
+            return link(*cached)
+
+        loaded_at = time.time()
+        try:
+            user = User.objects.select_related("profile").get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except User.DoesNotExist:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            )
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+        user_cache.set(user, user.profile, timeout, loaded_at)
+        return user
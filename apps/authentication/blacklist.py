@@ -0,0 +1,128 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+# Every refresh checks its token against the blacklist. Instead of a query,
+# each worker keeps a bloom filter of the blacklisted JTIs: a miss is final,
+# a hit is confirmed against the database, since the filter has false
+# positives. Blacklisting bumps a version in the cache, and a worker that
+# sees a new version (or has not looked for `TOKEN_BLACKLIST_REFRESH_INTERVAL`
+# seconds) loads the rows added since. An evicted version is replaced by a
+# new one, which reloads every filter. Like the claims markers in tokens.py,
+# other workers only see the version through a shared cache backend, so
+# with a per-process cache every refresh queries the blacklist.
+
+VERSION_KEY = "auth:blacklist-version"
+
+# Rows are loaded again until they are this old, as ids are allocated before
+# commit and a slow transaction can commit a lower id after a higher one
+SETTLE_TIME = timedelta(minutes=1)
+
+MIN_CAPACITY = 10_000
+ERROR_RATE = 0.001
+BATCH_SIZE = 10_000
+
+
+class BloomFilter:
+    """Set of strings with no false negatives and `error_rate` false positives"""
+
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.capacity = capacity
+        self.size = math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.size / 8))
+        self.count = 0
+
+    def get_positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.get_positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & 1 << (position & 7)
+            for position in self.get_positions(key)
+        )
+
+
+class BlacklistFilter:
+    """The bloom filter of one worker, loaded lazily and incrementally"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.bloom = None
+        self.settled_id = 0
+        self.version = None
+        self.loaded_at = 0
+
+    def might_contain(self, jti):
+        self.refresh()
+        return jti in self.bloom
+
+    def refresh(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            # Never bumped, or evicted since
+            cache.add(VERSION_KEY, time.time(), None)
+            version = cache.get(VERSION_KEY)
+        if (
+            self.bloom is not None
+            and version == self.version
+            and time.monotonic() - self.loaded_at
+            < settings.TOKEN_BLACKLIST_REFRESH_INTERVAL
+        ):
+            return
+
+        with self.lock:
+            # Past capacity the error rate climbs, and a new filter also
+            # forgets tokens pruned since the last one
+            if self.bloom is None or self.bloom.count >= self.bloom.capacity:
+                self.bloom = BloomFilter(
+                    max(MIN_CAPACITY, 2 * BlacklistedToken.objects.count())
+                )
+                self.settled_id = 0
+            self.load()
+            self.version = version
+            self.loaded_at = time.monotonic()
+
+    def load(self):
+        """Add the rows past the last settled one to the filter"""
+        settled_before = timezone.now() - SETTLE_TIME
+        settled = True
+        rows = (
+            BlacklistedToken.objects.filter(pk__gt=self.settled_id)
+            .order_by("pk")
+            .values_list("pk", "blacklisted_at", "token__jti")
+        )
+        for pk, blacklisted_at, jti in rows.iterator(chunk_size=BATCH_SIZE):
+            self.bloom.add(jti)
+            settled = settled and blacklisted_at < settled_before
+            if settled:
+                self.settled_id = pk
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def bump_version():
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, time.time(), None))
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+
+# Password hashing is slow on purpose and holds a core for the whole hash.
+# Login and register hash on a small pool per worker instead of the request
+# thread: at most `AUTH_HASH_CONCURRENCY` hashes run at once, up to
+# `AUTH_HASH_QUEUE_SIZE` more wait, and a hash still waiting after
+# `AUTH_HASH_QUEUE_TIMEOUT` seconds is dropped. A burst of logins is then
+# turned away with 429 or 503 rather than starving every other request.
+
+
+class HashingQueueFull(Throttled):
+    default_detail = "Too many logins in progress, try again shortly."
+
+
+class HashingQueueTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Login is temporarily unavailable, try again shortly."
+    default_code = "hashing_timeout"
+
+
+class HashingPool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def start(self):
+        """Create the pool and its slots on first use, from the settings"""
+        with self.lock:
+            if self.executor is None:
+                concurrency = settings.AUTH_HASH_CONCURRENCY
+                self.slots = threading.BoundedSemaphore(
+                    concurrency + settings.AUTH_HASH_QUEUE_SIZE
+                )
+                self.executor = ThreadPoolExecutor(
+                    concurrency, thread_name_prefix="password-hashing"
+                )
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    async def run(self, function, *args):
+        """Run `function(*args)` on the pool and return its result"""
+        self.start()
+        if not self.slots.acquire(blocking=False):
+            raise HashingQueueFull(wait=settings.AUTH_HASH_QUEUE_TIMEOUT)
+        try:
+            future = self.executor.submit(function, *args)
+            result = asyncio.wrap_future(future)
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(result), settings.AUTH_HASH_QUEUE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                # Only a hash that has not started can be dropped
+                if future.cancel():
+                    raise HashingQueueTimeout()
+                return await result
+        finally:
+            self.slots.release()
+
+
+hashing_pool = HashingPool()
+
+
+async def authenticate(email, password):
+    """
+    Return the user with these credentials, or None; the async counterpart
+    of `ModelBackend.authenticate`, hashing on the pool. Unlike it, inactive
+    users are returned, so the caller can tell them apart
+    """
+    User = get_user_model()
+    try:
+        user = await User._default_manager.aget_by_natural_key(email)
+    except User.DoesNotExist:
+        # Hash anyway, so response times do not tell which emails exist
+        await hashing_pool.run(make_password, password)
+        return None
+
+    is_correct, must_update = await hashing_pool.run(
+        verify_password, password, user.password
+    )
+    if not is_correct:
+        return None
+    if must_update:
+        user.password = await hashing_pool.run(make_password, password)
+        await user.asave(update_fields=["password"])
+    return user
@@ -0,0 +1,146 @@
+import json
+import time
+import uuid
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from ...blacklist import blacklist_filter
+from ...models import User
+from ...tokens import RefreshToken, cache_is_shared
+from ....articles.management.commands.benchmark_endpoints import percentile
+
+BATCH_SIZE = 10_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the token tables, time refreshes with and without the "
+        "blacklist filter and print the results as JSON; the rows are rolled "
+        "back afterwards. The filter is only used with a shared cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tokens",
+            type=int,
+            default=1_000_000,
+            help="Outstanding tokens to insert",
+        )
+        parser.add_argument(
+            "--blacklisted",
+            type=float,
+            default=0.1,
+            help="Share of the inserted tokens that is blacklisted",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help="Timed refreshes per mode",
+        )
+
+    def fill(self, user, tokens, blacklisted):
+        now = timezone.now()
+        expires_at = now + timedelta(days=1)
+        rows = (
+            OutstandingToken(
+                user=user,
+                jti=uuid.uuid4().hex,
+                token="",
+                created_at=now,
+                expires_at=expires_at,
+            )
+            for _ in range(tokens)
+        )
+        pks = []
+        while batch := list(islice(rows, BATCH_SIZE)):
+            pks.extend(
+                obj.pk for obj in OutstandingToken.objects.bulk_create(batch)
+            )
+
+        blacklisted_pks = iter(pks[: round(len(pks) * blacklisted)])
+        while batch := list(islice(blacklisted_pks, BATCH_SIZE)):
+            BlacklistedToken.objects.bulk_create(
+                BlacklistedToken(token_id=pk) for pk in batch
+            )
+
+    def refresh(self, client):
+        response = client.post("/api/users/refresh-token/")
+        if response.status_code != 200:
+            raise CommandError(f"Refresh answered {response.status_code}")
+        return response
+
+    def measure(self, client, use_filter):
+        with override_settings(TOKEN_BLACKLIST_FILTER=use_filter):
+            blacklist_filter.clear()
+            # The first refresh loads the filter
+            start = time.perf_counter()
+            self.refresh(client)
+            first_ms = (time.perf_counter() - start) * 1000
+
+            timings = []
+            start = time.perf_counter()
+            for _ in range(self.options["requests"]):
+                request_start = time.perf_counter()
+                self.refresh(client)
+                timings.append((time.perf_counter() - request_start) * 1000)
+            elapsed = time.perf_counter() - start
+
+            with CaptureQueriesContext(connection) as queries:
+                self.refresh(client)
+
+        return {
+            "requests": len(timings),
+            "per_second": round(len(timings) / elapsed, 1),
+            "first_ms": round(first_ms, 3),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "queries": len(queries),
+        }
+
+    def handle(self, *args, **options):
+        self.options = options
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                email="refresh-benchmark@example.com",
+                username="refresh-benchmark",
+            )
+            start = time.perf_counter()
+            self.fill(user, options["tokens"], options["blacklisted"])
+            fill_seconds = time.perf_counter() - start
+
+            client = Client()
+            client.cookies["refresh_token"] = str(RefreshToken.for_user(user))
+
+            # The test client identifies itself as "testserver"
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+            ):
+                report = {
+                    "database": connection.vendor,
+                    # Without it both modes query the blacklist
+                    "shared_cache": cache_is_shared(),
+                    "outstanding_tokens": OutstandingToken.objects.count(),
+                    "blacklisted_tokens": BlacklistedToken.objects.count(),
+                    "fill_seconds": round(fill_seconds, 1),
+                    "modes": {
+                        "query": self.measure(client, use_filter=False),
+                        "filter": self.measure(client, use_filter=True),
+                    },
+                }
+            transaction.set_rollback(True)
+        blacklist_filter.clear()
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from ...hashing import hashing_pool
+from ...models import User
+from ....articles.management.commands.benchmark_endpoints import percentile
+
+EMAIL = "load-test@example.com"
+PASSWORD = "load-test-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time article reads from concurrent clients while other clients log "
+        "in as fast as they can, with logins hashing on the bounded pool and "
+        "on as many threads as there are clients, and print the results as "
+        "JSON. Needs a database that other threads can see, not the test one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seconds", type=float, default=10, help="Duration of each run"
+        )
+        parser.add_argument(
+            "--readers", type=int, default=2, help="Clients reading articles"
+        )
+        parser.add_argument(
+            "--logins", type=int, default=8, help="Clients logging in"
+        )
+
+    def run_clients(self, readers, logins):
+        deadline = time.monotonic() + self.options["seconds"]
+        read_timings, login_statuses, errors = [], Counter(), []
+        lock = threading.Lock()
+
+        def read():
+            client = Client()
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                response = client.get("/api/articles/")
+                elapsed = (time.perf_counter() - start) * 1000
+                if response.status_code != 200:
+                    raise CommandError(f"Read answered {response.status_code}")
+                with lock:
+                    read_timings.append(elapsed)
+
+        def log_in():
+            client = Client()
+            while time.monotonic() < deadline:
+                response = client.post(
+                    "/api/users/login/",
+                    {"email": EMAIL, "password": PASSWORD},
+                    content_type="application/json",
+                )
+                with lock:
+                    login_statuses[response.status_code] += 1
+
+        def run(target):
+            try:
+                target()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=run, args=(target,))
+            for target in [read] * readers + [log_in] * logins
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise CommandError(f"A client failed: {errors[0]!r}")
+
+        return {
+            "reads": {
+                "requests": len(read_timings),
+                "p50_ms": round(percentile(read_timings, 50), 3),
+                "p99_ms": round(percentile(read_timings, 99), 3),
+            },
+            "logins": {
+                str(code): count
+                for code, count in sorted(login_statuses.items())
+            },
+        }
+
+    def run_mode(self, logins, **overrides):
+        with override_settings(**overrides):
+            hashing_pool.shutdown()
+            try:
+                return self.run_clients(self.options["readers"], logins)
+            finally:
+                hashing_pool.shutdown()
+
+    def handle(self, *args, **options):
+        self.options = options
+        logins = options["logins"]
+        if connection.settings_dict["NAME"] == ":memory:":
+            raise CommandError("An in-memory database is not shared")
+
+        user = User.objects.create_user(
+            email=EMAIL, username="loadtest", password=PASSWORD
+        )
+        try:
+            # The test client identifies itself as "testserver"
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+            ):
+                report = {
+                    "database": connection.vendor,
+                    "hasher": settings.PASSWORD_HASHERS[0],
+                    "modes": {
+                        "no-logins": self.run_mode(0),
+                        # Every login hashes at once, as on the request thread
+                        "unbounded": self.run_mode(
+                            logins,
+                            AUTH_HASH_CONCURRENCY=logins,
+                            AUTH_HASH_QUEUE_SIZE=0,
+                        ),
+                        "bounded": self.run_mode(logins),
+                    },
+                }
+        finally:
+            OutstandingToken.objects.filter(user=user).delete()
+            user.delete()
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding tokens and their blacklist entries in "
+        "batches; run it on a schedule, e.g. daily from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of tokens deleted per transaction",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches, to spare a busy database",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        # Tokens expiring while the command runs are left to the next run,
+        # so the loop always ends
+        expired = OutstandingToken.objects.filter(
+            expires_at__lte=timezone.now()
+        ).order_by("expires_at")
+        deleted = {"outstanding": 0, "blacklisted": 0}
+
+        while True:
+            with transaction.atomic():
+                pks = list(
+                    expired.values_list("pk", flat=True)[
+                        : options["batch_size"]
+                    ]
+                )
+                if not pks:
+                    break
+                _, counts = OutstandingToken.objects.filter(pk__in=pks).delete()
+            deleted["outstanding"] += counts.get(
+                OutstandingToken._meta.label, 0
+            )
+            deleted["blacklisted"] += counts.get(
+                "token_blacklist.BlacklistedToken", 0
+            )
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        report = {
+            "deleted": deleted,
+            "seconds": round(time.perf_counter() - start, 1),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
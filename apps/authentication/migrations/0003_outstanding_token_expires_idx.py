@@ -0,0 +1,20 @@
+from django.db import migrations
+
+# `prune_tokens` walks expired outstanding tokens in batches, which needs an
+# index on the expiry; the table belongs to simplejwt, so it is added here.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0002_remove_user_bio_remove_user_image_and_more"),
+        ("token_blacklist", "0012_alter_outstandingtoken_user"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS outstanding_token_expires_idx "
+            "ON token_blacklist_outstandingtoken (expires_at)",
+            "DROP INDEX IF EXISTS outstanding_token_expires_idx",
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0003_outstanding_token_expires_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="claims_changed_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.db import models
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
+    # When the claims carried by tokens last changed (see tokens.py)
+    claims_changed_at = models.DateTimeField(null=True, editable=False)
     # bio = models.TextField(blank=True, null=True)
     # image = models.URLField(blank=True, null=True)
 
@@ -1,9 +1,12 @@
-from django.contrib import auth
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
 
 from .models import User
+from .tokens import RefreshToken
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -26,9 +29,20 @@ class RegisterSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
+        # `Register` hashes the password off the request thread and passes
+        # the hash as `password_hash`; otherwise `create_user` hashes it
+        password_hash = validated_data.pop("password_hash", None)
         try:
-            # `create_user` would handle hashing and default behavior
-            return User.objects.create_user(**validated_data)
+            if password_hash is None:
+                return User.objects.create_user(**validated_data)
+            user = User(
+                email=User.objects.normalize_email(validated_data["email"]),
+                username=User.normalize_username(validated_data["username"]),
+                password=password_hash,
+            )
+            with transaction.atomic():
+                user.save()
+            return user
         except:
             raise serializers.ValidationError(
                 "An account with the provided credentials already exists.",
@@ -39,16 +53,10 @@ class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
-    def validate(self, attrs):
-        email: str = attrs.get("email", "")
-        password: str = attrs.get("password", "")
-        user = auth.authenticate(email=email, password=password)
 
-        if user is None:
-            raise AuthenticationFailed("Email or password is incorrect.")
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
 
-        if not user.is_active:
-            raise AuthenticationFailed("Account disabled.")
 
-        attrs["user"] = user
-        return attrs
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
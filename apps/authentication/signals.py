@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .blacklist import bump_version
+from .tokens import mark_changed
+from ..users.models import Profile
+
+# Tokens carry the username and active flag, and the per-process user cache
+# holds both rows, so any change to either outdates them (see tokens.py).
+# Queryset `update()` calls skip these signals and must call `mark_changed`.
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def outdate_user_claims(sender, instance, created=False, **kwargs):
+    if not created:
+        mark_changed(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def outdate_profile_claims(sender, instance, created=False, **kwargs):
+    if not created:
+        mark_changed(instance.user_id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def reload_blacklist_filters(sender, instance, created, **kwargs):
+    if created:
+        bump_version()
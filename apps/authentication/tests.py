@@ -1,3 +1,374 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken as PlainRefreshToken
+
+from . import backends
+from .blacklist import VERSION_KEY, BloomFilter, blacklist_filter
+from .hashing import hashing_pool
+from .models import User
+from .serializers import RegisterSerializer
+from .tokens import RefreshToken, get_changed_key
+from ..articles.models import Article
+
+
+LOCAL_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+# A cache every worker of a host sees, as claims are only trusted on one
+SHARED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "conduit-test-cache"),
+    }
+}
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class ClaimsAuthenticationTests(APITestCase):
+    """Authenticated requests must not load the user while its claims hold"""
+
+    def setUp(self):
+        cache.clear()
+        backends.user_cache.clear()
+        self.user = User.objects.create_user(
+            email="reader@example.com", username="reader", password="password"
+        )
+        author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        ).profile
+        self.article = Article.objects.create(
+            title="Article",
+            description="description",
+            body="body",
+            author=author,
+        )
+
+    def login(self):
+        response = self.client.post(
+            "/api/users/login/",
+            {"email": "reader@example.com", "password": "password"},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["access_token"]
+
+    def refresh(self):
+        return self.client.post("/api/users/refresh-token/")
+
+    def request(self, method, path, token):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(
+                path, HTTP_AUTHORIZATION=f"Bearer {token}"
+            )
+        # Fetches of the requesting user's row or of its profile's
+        lookups = [
+            f'WHERE "authentication_user"."id" = {self.user.pk} LIMIT',
+            f'WHERE "users_profile"."user_id" = {self.user.pk} LIMIT',
+        ]
+        user_queries = [
+            query["sql"]
+            for query in queries
+            if any(lookup in query["sql"] for lookup in lookups)
+        ]
+        return response, user_queries
+
+    def update_user(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in fields.items():
+                setattr(self.user, name, value)
+            self.user.save()
+
+    def test_requests_do_not_load_the_user(self):
+        token = self.login()
+
+        for method, path in [
+            ("get", "/api/articles/feed/"),
+            ("post", f"/api/articles/{self.article.slug}/favorite/"),
+            ("get", "/api/protected/"),
+        ]:
+            response, user_queries = self.request(method, path, token)
+            self.assertLess(response.status_code, 300)
+            self.assertEqual(user_queries, [])
+
+        self.assertEqual(response.data["user"], "reader")
+        self.assertTrue(
+            self.article.favorited_by.filter(user=self.user).exists()
+        )
+
+    def test_deactivation_rejects_issued_tokens(self):
+        token = self.login()
+        self.update_user(is_active=False)
+
+        response, _ = self.request("get", "/api/protected/", token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.refresh().status_code, 400)
+
+    def test_evicted_marker_is_read_from_the_row(self):
+        token = self.login()
+        self.update_user(is_active=False)
+        cache.delete(get_changed_key(self.user.pk))
+
+        response, _ = self.request("get", "/api/protected/", token)
+        self.assertEqual(response.status_code, 401)
+
+    def test_per_process_cache_reads_the_marker_from_the_row(self):
+        token = self.login()
+        with self.settings(CACHES=LOCAL_CACHES):
+            response, user_queries = self.request(
+                "get", "/api/protected/", token
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(user_queries), 1)
+
+            # As another worker would, leaving this one's cache alone
+            User.objects.filter(pk=self.user.pk).update(
+                is_active=False, claims_changed_at=timezone.now()
+            )
+            response, _ = self.request("get", "/api/protected/", token)
+            self.assertEqual(response.status_code, 401)
+
+    def test_username_change_outdates_claims(self):
+        token = self.login()
+        self.update_user(username="renamed")
+
+        response, user_queries = self.request("get", "/api/protected/", token)
+        self.assertEqual(response.data["user"], "renamed")
+        self.assertNotEqual(user_queries, [])
+
+        # Refreshing re-reads the claims
+        token = self.refresh().data["access_token"]
+        response, user_queries = self.request("get", "/api/protected/", token)
+        self.assertEqual(response.data["user"], "renamed")
+        self.assertEqual(user_queries, [])
+
+    def test_tokens_without_claims_load_the_user(self):
+        token = PlainRefreshToken.for_user(self.user).access_token
+
+        response, user_queries = self.request("get", "/api/protected/", token)
+        self.assertEqual(response.data["user"], "reader")
+        self.assertNotEqual(user_queries, [])
+
+    def test_user_cache_keeps_full_rows_until_changed(self):
+        token = self.login()
+
+        with self.settings(AUTH_USER_CACHE_TIMEOUT=60):
+            _, loading = self.request("get", "/api/user/", token)
+            response, cached = self.request("get", "/api/user/", token)
+            self.assertEqual(response.data["email"], "reader@example.com")
+            self.assertEqual(len(cached), len(loading) - 1)
+
+            self.update_user(email="moved@example.com")
+            token = self.refresh().data["access_token"]
+            response, _ = self.request("get", "/api/user/", token)
+            self.assertEqual(response.data["email"], "moved@example.com")
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class BlacklistFilterTests(APITestCase):
+    """Refreshes must skip the blacklist query unless the filter matches"""
+
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.clear()
+        self.user = User.objects.create_user(
+            email="reader@example.com", username="reader", password="password"
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.cookies["refresh_token"] = str(self.token)
+
+    def refresh(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/users/refresh-token/")
+        return response, len(queries)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        keys = [uuid.uuid4().hex for _ in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10_000))
+        self.assertLess(false_positives, 100)
+
+    def test_refresh_skips_the_blacklist_query(self):
+        self.refresh()
+        response, queries = self.refresh()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, 0)
+
+    def test_blacklisted_tokens_are_rejected(self):
+        self.assertEqual(self.refresh()[0].status_code, 200)
+
+        # As if blacklisted by another worker: only the version tells
+        with self.captureOnCommitCallbacks(execute=True):
+            BlacklistedToken.objects.create(
+                token=OutstandingToken.objects.get(jti=self.token["jti"])
+            )
+        self.assertEqual(self.refresh()[0].status_code, 400)
+
+    def blacklist(self):
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.get(jti=self.token["jti"])
+        )
+
+    def test_evicted_version_reloads_the_filter(self):
+        self.assertEqual(self.refresh()[0].status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blacklist()
+        cache.delete(VERSION_KEY)
+        self.assertEqual(self.refresh()[0].status_code, 400)
+
+    def test_per_process_cache_queries_the_blacklist(self):
+        with self.settings(CACHES=LOCAL_CACHES):
+            self.assertEqual(self.refresh()[0].status_code, 200)
+
+            # Blacklisted by another worker, whose version bump this one
+            # cannot see
+            self.blacklist()
+            self.assertEqual(self.refresh()[0].status_code, 400)
+
+    def test_logout_blacklists_the_refresh_token(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/users/logout/",
+                HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}",
+            )
+        self.assertEqual(response.status_code, 204)
+
+        self.client.cookies["refresh_token"] = str(self.token)
+        self.assertEqual(self.refresh()[0].status_code, 400)
+
+    def test_prune_deletes_expired_tokens_in_batches(self):
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.exclude(jti=self.token["jti"]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        out = StringIO()
+        call_command("prune_tokens", "--batch-size=1", stdout=out)
+        self.assertEqual(
+            json.loads(out.getvalue())["deleted"],
+            {"outstanding": 1, "blacklisted": 1},
+        )
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)),
+            [self.token["jti"]],
+        )
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command(
+            "benchmark_token_refresh",
+            "--tokens=50",
+            "--requests=2",
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertTrue(report["shared_cache"])
+        self.assertEqual(report["modes"]["query"]["queries"], 1)
+        self.assertEqual(report["modes"]["filter"]["queries"], 0)
+
+
+class HashingPoolTests(APITestCase):
+    """Login and register hash on a bounded pool and shed load past it"""
+
+    def setUp(self):
+        hashing_pool.shutdown()
+        self.addCleanup(hashing_pool.shutdown)
+
+    def login(self, password="password"):
+        return self.client.post(
+            "/api/users/login/",
+            {"email": "reader@example.com", "password": password},
+            format="json",
+        )
+
+    def register(self):
+        return self.client.post(
+            "/api/users/",
+            {
+                "email": "reader@EXAMPLE.com",
+                "username": "reader",
+                "password": "password",
+            },
+            format="json",
+        )
+
+    def test_register_and_login(self):
+        response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json(),
+            {"email": "reader@example.com", "username": "reader"},
+        )
+        self.assertEqual(self.register().status_code, 400)
+
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["username"], "reader")
+        self.assertIn("refresh_token", response.cookies)
+        self.assertEqual(self.login("wrong password").status_code, 403)
+
+    def test_inactive_account(self):
+        self.register()
+        User.objects.filter(username="reader").update(is_active=False)
+        response = self.login()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["detail"], "Account disabled.")
+
+    def test_serializer_hashes_the_password_by_default(self):
+        serializer = RegisterSerializer(
+            data={
+                "email": "reader@example.com",
+                "username": "reader",
+                "password": "password",
+            }
+        )
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        self.assertNotEqual(user.password, "password")
+        self.assertTrue(user.check_password("password"))
+
+    @override_settings(AUTH_HASH_CONCURRENCY=1, AUTH_HASH_QUEUE_SIZE=0)
+    def test_full_queue_answers_429(self):
+        hashing_pool.start()
+        # A login elsewhere holds the only slot
+        hashing_pool.slots.acquire()
+        self.addCleanup(hashing_pool.slots.release)
+
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "2")
+
+    @override_settings(
+        AUTH_HASH_CONCURRENCY=1,
+        AUTH_HASH_QUEUE_SIZE=1,
+        AUTH_HASH_QUEUE_TIMEOUT=0.05,
+    )
+    def test_queue_timeout_answers_503(self):
+        hashing_pool.start()
+        # A slow hash holds the only thread
+        release = threading.Event()
+        hashing_pool.executor.submit(release.wait)
+        self.addCleanup(release.set)
+
+        self.assertEqual(self.login().status_code, 503)
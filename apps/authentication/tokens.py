@@ -0,0 +1,138 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+from .blacklist import blacklist_filter
+from .models import User
+
+# Tokens carry enough about their user for `ClaimsJWTAuthentication` to
+# authenticate requests without loading it. `claims_at` records when the
+# claims were read from the database; saving a user (or their profile)
+# moves `User.claims_changed_at`, and claims older than it are not trusted:
+# requests fall back to the database and the next refresh re-reads the
+# claims.
+#
+# The marker is copied to the cache, and read from there when the cache is
+# shared by the workers (`CACHE_BACKEND`). An evicted copy is read again
+# from the row. A per-process cache cannot tell a worker about changes made
+# by the others, so with one the marker is read from the row every time.
+
+CLAIMS_AT = "claims_at"
+
+
+def get_changed_key(user_id):
+    return f"auth:claims-changed:{user_id}"
+
+
+def get_changed_timeout():
+    # Markers outlive every token issued before them
+    return (
+        api_settings.REFRESH_TOKEN_LIFETIME + api_settings.ACCESS_TOKEN_LIFETIME
+    ).total_seconds()
+
+
+def cache_is_shared():
+    return not isinstance(caches["default"], LocMemCache)
+
+
+def get_changed_at(user_id):
+    """
+    Return when the claims of `user_id` last changed, as a timestamp: 0 if
+    they never did, infinity once the user is deleted
+    """
+    key = get_changed_key(user_id)
+    shared = cache_is_shared()
+    if shared:
+        changed_at = cache.get(key)
+        if changed_at is not None:
+            return changed_at
+
+    try:
+        changed_at = User.objects.values_list(
+            "claims_changed_at", flat=True
+        ).get(pk=user_id)
+    except User.DoesNotExist:
+        changed_at = math.inf
+    else:
+        changed_at = 0 if changed_at is None else changed_at.timestamp()
+
+    if shared:
+        # Unless a newer marker was set meanwhile
+        cache.add(key, changed_at, get_changed_timeout())
+    return changed_at
+
+
+def mark_changed(user_id):
+    """Distrust the claims of `user_id` issued so far"""
+    changed_at = timezone.now()
+    User.objects.filter(pk=user_id).update(claims_changed_at=changed_at)
+    transaction.on_commit(
+        lambda: cache.set(
+            get_changed_key(user_id),
+            changed_at.timestamp(),
+            get_changed_timeout(),
+        )
+    )
+
+
+def get_claims(user):
+    return {
+        "profile_id": user.profile.pk,
+        "username": user.username,
+        "is_active": user.is_active,
+        CLAIMS_AT: time.time(),
+    }
+
+
+def claims_are_current(token, changed_at):
+    claims_at = token.get(CLAIMS_AT)
+    return claims_at is not None and changed_at < claims_at
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh token whose access tokens carry the user's claims, and whose
+    blacklist check goes through the worker's filter (see blacklist.py)
+    """
+
+    def check_blacklist(self):
+        if (
+            settings.TOKEN_BLACKLIST_FILTER
+            and cache_is_shared()
+            and not blacklist_filter.might_contain(self[api_settings.JTI_CLAIM])
+        ):
+            return
+        super().check_blacklist()
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.payload.update(get_claims(user))
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user_id = self[api_settings.USER_ID_CLAIM]
+        if claims_are_current(access, get_changed_at(user_id)):
+            return access
+
+        # Issued before the user changed, or by plain simplejwt
+        try:
+            user = User.objects.select_related("profile").get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except User.DoesNotExist:
+            raise TokenError("User not found")
+        if not user.is_active:
+            raise TokenError("User is inactive")
+        access.payload.update(get_claims(user))
+        return access
@@ -1,14 +1,27 @@
+import json
+import math
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    ParseError,
+)
 from rest_framework.views import APIView
-from rest_framework.generics import GenericAPIView, CreateAPIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 
+from .hashing import authenticate, hashing_pool
 from .serializers import RegisterSerializer, LoginSerializer
-from .models import User
+from .tokens import RefreshToken
 
 
 class SampleRoute(APIView):
@@ -30,31 +43,76 @@ class SampleAuthenticatedRoute(APIView):
         return Response(content)
 
 
-class Register(CreateAPIView):
-    queryset = User.objects.all()
-    serializer_class = RegisterSerializer
-    authentication_classes = []
+def get_data(request):
+    if request.content_type == "application/json":
+        return json.loads(request.body or b"{}")
+    return request.POST
 
 
-class Login(GenericAPIView):
-    serializer_class = LoginSerializer
-    authentication_classes = []
+def error_response(error):
+    """Answer with an `APIException` like DRF's exception handler would"""
+    detail = error.detail
+    if not isinstance(detail, (list, dict)):
+        detail = {"detail": detail}
+    status_code = error.status_code
+    # Without authenticators, DRF answers 403 as there is no challenge to send
+    if isinstance(error, AuthenticationFailed):
+        status_code = status.HTTP_403_FORBIDDEN
+    response = JsonResponse(detail, status=status_code, safe=False)
+    if getattr(error, "wait", None):
+        response["Retry-After"] = str(math.ceil(error.wait))
+    return response
 
-    def post(self, request):
-        serializer = self.serializer_class(data=request.data)
-        serializer.is_valid(raise_exception=True)
 
-        if type(serializer.validated_data) is not dict:
-            return Response(
-                "Invalid data structure.", status=status.HTTP_400_BAD_REQUEST
+# Login and register hash on the bounded pool of hashing.py. They are async,
+# so under ASGI a request waiting on the pool leaves the event loop free;
+# under WSGI the pool still caps how many hashes compete with other requests
+# for the CPU. They are plain Django views, as DRF views cannot be async.
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class Register(View):
+    async def post(self, request):
+        try:
+            serializer = RegisterSerializer(data=get_data(request))
+            serializer.is_valid(raise_exception=True)
+            password_hash = await hashing_pool.run(
+                make_password, serializer.validated_data["password"]
             )
+            await sync_to_async(serializer.save)(password_hash=password_hash)
+        except ValueError:
+            return error_response(ParseError())
+        except APIException as error:
+            return error_response(error)
+
+        return JsonResponse(serializer.data, status=status.HTTP_201_CREATED)
 
-        user: User = serializer.validated_data["user"]
-        refresh_token = RefreshToken.for_user(user)
 
-        response = Response(
+def issue_tokens(user):
+    refresh_token = RefreshToken.for_user(user)
+    return str(refresh_token), str(refresh_token.access_token)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class Login(View):
+    async def post(self, request):
+        try:
+            serializer = LoginSerializer(data=get_data(request))
+            serializer.is_valid(raise_exception=True)
+            user = await authenticate(**serializer.validated_data)
+            if user is None:
+                raise AuthenticationFailed("Email or password is incorrect.")
+            if not user.is_active:
+                raise AuthenticationFailed("Account disabled.")
+        except ValueError:
+            return error_response(ParseError())
+        except APIException as error:
+            return error_response(error)
+
+        refresh_token, access_token = await sync_to_async(issue_tokens)(user)
+        response = JsonResponse(
             {
-                "access_token": str(refresh_token.access_token),
+                "access_token": access_token,
                 "username": user.username,
                 "email": user.email,
             },
@@ -62,7 +120,7 @@ class Login(GenericAPIView):
         )
         response.set_cookie(
             key="refresh_token",
-            value=str(refresh_token),
+            value=refresh_token,
             httponly=True,
             secure=not settings.DEBUG,
             samesite="None" if not settings.DEBUG else "Lax",
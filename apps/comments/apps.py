@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.comments"
+
+    def ready(self):
+        # Import signals to ensure they are registered
+        import apps.comments.signals
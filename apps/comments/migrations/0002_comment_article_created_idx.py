@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0013_article_author_created_idx"),
+        ("comments", "0001_initial"),
+        ("users", "0003_profile_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["article", "-created_at", "-id"],
+                name="comment_article_created_idx",
+            ),
+        ),
+    ]
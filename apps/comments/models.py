@@ -15,6 +15,13 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # An article's comments, newest first, in one index range scan
+            models.Index(
+                fields=["article", "-created_at", "-id"],
+                name="comment_article_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author.user.username} on {self.article.title}: {self.body[:20]}..."
@@ -1,13 +1,31 @@
-from rest_framework.serializers import ModelSerializer
+from django.db.models import prefetch_related_objects
+from rest_framework.serializers import ListSerializer, ModelSerializer
+
+from api.metrics import TimedSerializerMixin
 
 from .models import Comment
-from ..users.serializers import ProfileViewSerializer
+from ..users.serializers import ProfileViewSerializer, get_following_ids
+
+
+class CommentListSerializer(TimedSerializerMixin, ListSerializer):
+    """Loads authors and the viewer's follows for a whole list of comments"""
+
+    def to_representation(self, data):
+        comments = list(data.all() if hasattr(data, "all") else data)
+        prefetch_related_objects(comments, "author__user")
+
+        request = self.context.get("request")
+        authors = [comment.author for comment in comments]
+        if "following_ids" not in self.context:
+            self.context["following_ids"] = get_following_ids(request, authors)
+        return super().to_representation(comments)
 
 
-class CommentSerializer(ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, ModelSerializer):
     author = ProfileViewSerializer(read_only=True)
 
     class Meta:
         model = Comment
+        list_serializer_class = CommentListSerializer
         exclude = ("article",)
         read_only_fields = ("id", "created_at", "updated_at")
@@ -0,0 +1,55 @@
+from django.db.models import Count, F, OuterRef, QuerySet, Subquery
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Comment
+from ..articles.models import Article
+from ..users.models import Profile
+
+
+# `Article.comments_count` follows the comments of each article. Comments
+# deleted along with their article need no count; those deleted along with
+# their author's profile are subtracted in one UPDATE per profile rather
+# than one per comment. Rows written with `bulk_create` or deleted with raw
+# SQL need `manage.py reconcile_counters --fix`.
+
+
+def change_comments_count(article_id, delta):
+    """Atomically shift the stored comment count of an article"""
+    Article.objects.filter(pk=article_id).update(
+        comments_count=F("comments_count") + delta,
+        changed_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        change_comments_count(instance.article_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    # Only comments deleted for themselves, not by a cascade
+    if isinstance(origin, Comment) or (
+        isinstance(origin, QuerySet) and origin.model is Comment
+    ):
+        change_comments_count(instance.article_id, -1)
+
+
+@receiver(pre_delete, sender=Profile)
+def discard_profile_comments(sender, instance, **kwargs):
+    own_comments = (
+        Comment.objects.filter(article=OuterRef("pk"), author=instance)
+        .order_by()
+        .values("article")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Article.objects.filter(
+        pk__in=instance.comments.values("article_id")
+    ).update(
+        comments_count=F("comments_count") - Subquery(own_comments),
+        changed_at=timezone.now(),
+    )
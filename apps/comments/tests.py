@@ -1,3 +1,240 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
+
+from . import signals
+from .models import Comment
+from ..articles.models import Article
+from ..authentication.models import User
+
+
+class CommentQueryCountTests(APITestCase):
+    """The number of queries for a listing must not grow with its length"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            email="viewer@example.com", username="viewer", password="password"
+        )
+        author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        ).profile
+        cls.short = Article.objects.create(
+            title="Short", description="description", body="body", author=author
+        )
+        cls.long = Article.objects.create(
+            title="Long", description="description", body="body", author=author
+        )
+
+        for i in range(10):
+            commenter = User.objects.create_user(
+                email=f"commenter{i}@example.com",
+                username=f"commenter{i}",
+                password="password",
+            ).profile
+            commenter.followers.add(cls.viewer.profile)
+            if i < 2:
+                Comment.objects.create(
+                    author=commenter, article=cls.short, body="comment"
+                )
+            Comment.objects.create(
+                author=commenter, article=cls.long, body="comment"
+            )
+
+    def count_queries(self, article):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f"/api/articles/{article.slug}/comments/?cursor="
+            )
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data["results"]
+
+    def test_list_queries_do_not_grow_with_comment_count(self):
+        self.client.force_authenticate(self.viewer)
+        short_count, short_comments = self.count_queries(self.short)
+        long_count, long_comments = self.count_queries(self.long)
+
+        self.assertEqual(len(short_comments), 2)
+        self.assertEqual(len(long_comments), 10)
+        self.assertEqual(short_count, long_count)
+        for comment in long_comments:
+            self.assertTrue(comment["author"]["following"])
+
+    def test_comments_are_paged_by_cursor(self):
+        url = f"/api/articles/{self.long.slug}/comments/"
+        expected = list(
+            Comment.objects.filter(article=self.long)
+            .order_by("-created_at", "-id")
+            .values_list("pk", flat=True)
+        )
+
+        seen = []
+        response = self.client.get(f"{url}?limit=4")
+        while True:
+            self.assertNotIn("count", response.data)
+            seen += [comment["id"] for comment in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        self.assertEqual(seen, expected)
+
+    def test_every_comment_unless_paging_is_requested(self):
+        url = f"/api/articles/{self.long.slug}/comments/"
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 10)
+
+        response = self.client.get(f"{url}?cursor=&limit=4")
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertIsNotNone(response.data["next"])
+
+    @override_settings(COMMENTS_PAGINATED=True)
+    def test_paging_can_be_turned_on_for_every_client(self):
+        url = f"/api/articles/{self.long.slug}/comments/"
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertIsNone(response.data["next"])
+
+
+class CommentsCountTests(APITestCase):
+    """`Article.comments_count` follows comment writes and cascades"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            email="author@example.com", username="author", password="password"
+        )
+        self.commenter = User.objects.create_user(
+            email="commenter@example.com",
+            username="commenter",
+            password="password",
+        )
+        self.article = Article.objects.create(
+            title="Discussed",
+            description="description",
+            body="body",
+            author=self.author.profile,
+        )
+        self.url = f"/api/articles/{self.article.slug}/comments/"
+
+    def assert_count(self, expected):
+        response = self.client.get(f"/api/articles/{self.article.slug}/")
+        self.assertEqual(response.data["comments_count"], expected)
+
+    def post_comment(self):
+        response = self.client.post(self.url, {"body": "comment"})
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def test_create_and_destroy(self):
+        self.client.force_authenticate(self.commenter)
+        first = self.post_comment()
+        self.post_comment()
+        self.assert_count(2)
+
+        response = self.client.delete(f"{self.url}{first}/")
+        self.assertEqual(response.status_code, 204)
+        self.assert_count(1)
+
+    def test_profile_deletion_cascades(self):
+        self.client.force_authenticate(self.commenter)
+        self.post_comment()
+        self.client.force_authenticate(self.author)
+        self.post_comment()
+
+        self.commenter.delete()
+        self.assert_count(1)
+
+    def count_article_updates(self, delete):
+        with CaptureQueriesContext(connection) as queries:
+            delete()
+        return sum(
+            query["sql"].startswith('UPDATE "articles_article"')
+            for query in queries
+        )
+
+    def test_cascades_do_not_update_per_comment(self):
+        other = Article.objects.create(
+            title="Also discussed",
+            description="description",
+            body="body",
+            author=self.author.profile,
+        )
+        for article in [self.article, self.article, other, other, other]:
+            Comment.objects.create(
+                article=article, author=self.commenter.profile, body="comment"
+            )
+        Comment.objects.create(
+            article=other, author=self.author.profile, body="comment"
+        )
+
+        self.assertEqual(self.count_article_updates(self.commenter.delete), 1)
+        self.assert_count(0)
+        other.refresh_from_db()
+        self.assertEqual(other.comments_count, 1)
+
+        self.assertEqual(self.count_article_updates(self.article.delete), 0)
+
+    def test_reconcile_repairs_drift(self):
+        Comment.objects.bulk_create(
+            [
+                Comment(article=self.article, author=self.commenter.profile)
+                for _ in range(3)
+            ]
+        )
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("comments_count: 1 drifted rows found", out.getvalue())
+
+        call_command("reconcile_counters", "--fix", stdout=out)
+        self.assert_count(3)
+
+
+class ConcurrentCommentTests(APITestCase):
+    """Comments posted at the same time must all be counted"""
+
+    def test_interleaved_posts(self):
+        author, first, second = [
+            User.objects.create_user(
+                email=f"{name}@example.com", username=name, password="password"
+            )
+            for name in ["author", "first", "second"]
+        ]
+        article = Article.objects.create(
+            title="Busy",
+            description="description",
+            body="body",
+            author=author.profile,
+        )
+        url = f"/api/articles/{article.slug}/comments/"
+        other = APIClient()
+        other.force_authenticate(second)
+        change_comments_count = signals.change_comments_count
+        statuses, interleaved = [], False
+
+        def change_after_other_post(article_id, delta):
+            # The second post runs between the first one's insert and its
+            # count update, as it could from another worker
+            nonlocal interleaved
+            if not interleaved:
+                interleaved = True
+                statuses.append(other.post(url, {"body": "second"}).status_code)
+            change_comments_count(article_id, delta)
+
+        self.client.force_authenticate(first)
+        with mock.patch.object(
+            signals,
+            "change_comments_count",
+            side_effect=change_after_other_post,
+        ):
+            statuses.append(
+                self.client.post(url, {"body": "first"}).status_code
+            )
+
+        self.assertEqual(statuses, [201, 201])
+        article.refresh_from_db()
+        self.assertEqual(article.comments_count, 2)
@@ -1,28 +1,66 @@
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from api.asyncviews import AsyncReadMixin, alist
 
 from .models import Comment
 from .serializers import CommentSerializer
 
 from ..articles.models import Article
+from ..articles.pagination import FlexiblePagination
+from ..users.serializers import aget_following_ids
+
+
+class CommentPagination(FlexiblePagination):
+    """
+    Cursor pagination for comments, newest first, along the
+    (article, created_at, id) index
+
+    Only requests sending `?cursor=` or `?limit=` are paginated, so clients
+    that expect every comment keep getting a plain list, unless
+    `COMMENTS_PAGINATED` is on.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_paginated(request, view):
+            return None
+        return self.paginate_cursor(queryset, request)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if not self.is_paginated(request, view):
+            return None
+        return await self.apaginate_cursor(queryset, request)
+
+    def is_paginated(self, request, view):
+        self.view = view
+        self.count_approximate = False
+
+        requested = any(
+            param in request.query_params
+            for param in (self.cursor_query_param, self.page_size_query_param)
+        )
+        return settings.COMMENTS_PAGINATED or requested
 
 
 # Create your views here.
-class CommentViewset(ModelViewSet):
+class CommentViewset(AsyncReadMixin, ModelViewSet):
     """
     A viewset for CRUD operations on comments.
     """
 
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related("author__user")
     serializer_class = CommentSerializer
     permission_classes = []
-    pagination_class = None
+    pagination_class = CommentPagination
 
     def get_queryset(self):
         article_slug = self.kwargs.get("article_slug")
         if article_slug:
-            comments = Comment.objects.filter(article__slug=article_slug)
+            comments = super().get_queryset().filter(article__slug=article_slug)
             return comments.order_by("-created_at")
         return super().get_queryset()
 
@@ -31,8 +69,44 @@ class CommentViewset(ModelViewSet):
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(getattr(self, "viewer_flags", {}))
+        return context
+
+    # The serializers would look the viewer's follows up synchronously
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        comments = await alist(queryset) if page is None else page
+        await self.aset_viewer_flags(comments)
+
+        serializer = self.get_serializer(comments, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        comment = await self.aget_object()
+        await self.aset_viewer_flags([comment])
+        return Response(self.get_serializer(comment).data)
+
+    async def aset_viewer_flags(self, comments):
+        authors = [comment.author for comment in comments]
+        self.viewer_flags = {
+            "following_ids": await aget_following_ids(self.request, authors)
+        }
+
+    # The comment and its article's `comments_count` change together
+
+    @transaction.atomic
     def perform_create(self, serializer):
         user = self.request.user
         article_slug = self.kwargs.get("article_slug")
         article = get_object_or_404(Article, slug=article_slug)
         serializer.save(author=getattr(user, "profile"), article=article)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
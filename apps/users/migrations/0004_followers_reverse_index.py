@@ -0,0 +1,19 @@
+from django.db import migrations
+
+# The unique (from_profile, to_profile) pair serves "who follows this
+# author"; listing whom a reader follows needs the pair the other way round.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_profile_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS profile_following_idx "
+            "ON users_profile_followers (to_profile_id, from_profile_id)",
+            "DROP INDEX IF EXISTS profile_following_idx",
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_follow_counts(apps, schema_editor):
+    Profile = apps.get_model("users", "Profile")
+    for field, relation in [
+        ("followers_count", "followers"),
+        ("following_count", "following"),
+    ]:
+        counts = (
+            Profile.objects.filter(pk=OuterRef("pk"))
+            .annotate(count=Count(relation))
+            .values("count")
+        )
+        Profile.objects.update(**{field: Subquery(counts)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_followers_reverse_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+# The followers and following listings page through the links of one
+# profile by link id, newest first, straight off these indexes.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_profile_follow_counts"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS profile_followers_keyset_idx "
+            "ON users_profile_followers (from_profile_id, id)",
+            "DROP INDEX IF EXISTS profile_followers_keyset_idx",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS profile_following_keyset_idx "
+            "ON users_profile_followers (to_profile_id, id)",
+            "DROP INDEX IF EXISTS profile_following_keyset_idx",
+        ),
+    ]
@@ -11,12 +11,16 @@ class Profile(models.Model):
     )
     bio = models.TextField(blank=True, null=True)
     image = models.URLField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     followers = models.ManyToManyField(
         "self",
         related_name="following",
         blank=True,
         symmetrical=False,
     )
+    # Maintained by the `followers` signal handlers in signals.py
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.user.username
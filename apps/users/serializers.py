@@ -1,24 +1,69 @@
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
+from api.asyncviews import alist
+from api.metrics import TimedSerializerMixin
+
 from ..authentication.models import User
 from .models import Profile
 
 
+def get_follows(request, profiles):
+    """
+    Return the ids of `profiles` followed by the requesting user, as a
+    queryset, or None for anonymous requests
+    """
+    if not request or not request.user.is_authenticated:
+        return None
+
+    follows = Profile.followers.through.objects.filter(
+        from_profile_id__in=[profile.pk for profile in profiles],
+        to_profile__user=request.user,
+    )
+    return follows.values_list("from_profile_id", flat=True)
+
+
+def get_following_ids(request, profiles):
+    """Return the ids of `profiles` followed by the requesting user"""
+    follows = get_follows(request, profiles)
+    return set() if follows is None else set(follows)
+
+
+async def aget_following_ids(request, profiles):
+    follows = get_follows(request, profiles)
+    return set() if follows is None else set(await alist(follows))
+
+
+class ProfileListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Loads users and the viewer's follows for a whole list of profiles"""
+
+    def to_representation(self, data):
+        profiles = list(data.all() if hasattr(data, "all") else data)
+        prefetch_related_objects(profiles, "user")
+
+        request = self.context.get("request")
+        if "following_ids" not in self.context:
+            self.context["following_ids"] = get_following_ids(request, profiles)
+        return super().to_representation(profiles)
+
+
 # This is for route: # /profiles/<username>
-class ProfileViewSerializer(serializers.ModelSerializer):
+class ProfileViewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Profile
-        fields = ["bio", "image", "followers"]
+        list_serializer_class = ProfileListSerializer
+        fields = ["bio", "image", "followers_count", "following_count"]
 
     def to_representation(self, instance):
         request = self.context.get("request")
         rep = super().to_representation(instance)
-        rep.pop("followers", None)
 
-        rep["following"] = False
-        if request and request.user.is_authenticated:
-            user_who_follows = instance.followers.filter(user=request.user)
-            rep["following"] = user_who_follows.exists()
+        # Populated by the list serializers of profiles, articles and comments
+        following_ids = self.context.get("following_ids")
+        if following_ids is None:
+            following_ids = get_following_ids(request, [instance])
+
+        rep["following"] = instance.pk in following_ids
 
         rep["username"] = instance.user.username
         rep["email"] = instance.user.email
@@ -26,7 +71,9 @@ class ProfileViewSerializer(serializers.ModelSerializer):
 
 
 # This is for route: # /user/
-class OwnProfileViewUpdateSerializer(serializers.ModelSerializer):
+class OwnProfileViewUpdateSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     username = serializers.CharField(source="user.username", required=False)
     email = serializers.CharField(source="user.email", required=False)
     password = serializers.CharField(
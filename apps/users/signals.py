@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_save, pre_delete
 from django.dispatch import receiver
 from django.conf import settings
+from django.utils import timezone
 
 from .models import Profile
 
@@ -9,3 +11,104 @@ from .models import Profile
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def touch_user_profile(sender, instance, created, **kwargs):
+    # Username and email are shown with the profile, so edits to the user
+    # move the profile's change marker as well
+    if not created:
+        Profile.objects.filter(user=instance).update(updated_at=timezone.now())
+
+
+# `followers_count` and `following_count` are kept in step with the
+# `followers` through table, whose `from_profile` is the followed profile
+# and `to_profile` the follower. Both are shown with the profile, so they
+# move its change marker. Rows written straight to the through table bypass
+# these handlers; run `manage.py reconcile_counters --fix` afterwards.
+
+
+def change_follow_count(field, profile_ids, delta):
+    """Atomically shift a stored follow count of the given profiles"""
+    if delta:
+        Profile.objects.filter(pk__in=profile_ids).update(
+            **{field: F(field) + delta}, updated_at=timezone.now()
+        )
+
+
+def discard_existing_follows(sender, instance, reverse, pk_set):
+    """
+    Lock the profiles on both ends of the new follows, then drop from
+    `pk_set` the links that a concurrent follow created after Django looked
+    for them
+    """
+    if reverse:
+        links = sender.objects.filter(to_profile=instance)
+        existing = links.filter(from_profile_id__in=pk_set).values_list(
+            "from_profile_id", flat=True
+        )
+    else:
+        links = sender.objects.filter(from_profile=instance)
+        existing = links.filter(to_profile_id__in=pk_set).values_list(
+            "to_profile_id", flat=True
+        )
+
+    locked = Profile.objects.filter(pk__in=[instance.pk, *pk_set])
+    list(locked.order_by("pk").select_for_update().values_list("pk", flat=True))
+    pk_set.difference_update(existing)
+
+
+@receiver(m2m_changed, sender=Profile.followers.through)
+def update_follow_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    # `instance` follows the profiles in `pk_set` when the change is made
+    # through `profile.following`, otherwise they follow `instance`
+    own_field, other_field = (
+        ("following_count", "followers_count")
+        if reverse
+        else ("followers_count", "following_count")
+    )
+
+    if action == "pre_add":
+        # Django inserts and reports the same `pk_set` after this signal, so
+        # a follow made twice at once is inserted and counted only once
+        discard_existing_follows(sender, instance, reverse, pk_set)
+
+    elif action == "post_add":
+        change_follow_count(own_field, [instance.pk], len(pk_set))
+        change_follow_count(other_field, pk_set, 1)
+
+    elif action in ("pre_remove", "pre_clear"):
+        if reverse:
+            links = sender.objects.filter(to_profile=instance)
+            if pk_set is not None:
+                links = links.filter(from_profile_id__in=pk_set)
+            other = "from_profile_id"
+        else:
+            links = sender.objects.filter(from_profile=instance)
+            if pk_set is not None:
+                links = links.filter(to_profile_id__in=pk_set)
+            other = "to_profile_id"
+
+        # Lock the links about to be deleted so that concurrent unfollows
+        # are not counted twice
+        other_ids = list(
+            links.select_for_update().values_list(other, flat=True)
+        )
+        change_follow_count(own_field, [instance.pk], -len(other_ids))
+        change_follow_count(other_field, other_ids, -1)
+
+
+@receiver(pre_delete, sender=Profile)
+def discard_profile_follows(sender, instance, **kwargs):
+    # Deleting a profile cascades to its links without `m2m_changed`
+    links = Profile.followers.through.objects
+    change_follow_count(
+        "following_count",
+        links.filter(from_profile=instance).values("to_profile_id"),
+        -1,
+    )
+    change_follow_count(
+        "followers_count",
+        links.filter(to_profile=instance).values("from_profile_id"),
+        -1,
+    )
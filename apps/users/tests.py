@@ -1,3 +1,169 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from . import signals
+from .models import Profile
+from ..authentication.models import User
+
+
+def create_profile(username):
+    return User.objects.create_user(
+        email=f"{username}@example.com", username=username, password="password"
+    ).profile
+
+
+class FollowCountTests(APITestCase):
+    """Follower and following counts are maintained on every follow change"""
+
+    def setUp(self):
+        self.author = create_profile("author")
+        self.reader = create_profile("reader")
+        self.client.force_authenticate(self.reader.user)
+
+    def get_counts(self, *profiles):
+        """Return `[(followers_count, following_count)]` as stored"""
+        counts = {
+            pk: (followers, following)
+            for pk, followers, following in Profile.objects.values_list(
+                "pk", "followers_count", "following_count"
+            )
+        }
+        return [counts[profile.pk] for profile in profiles]
+
+    def test_follow_and_unfollow(self):
+        url = "/api/profiles/author/follow/"
+        self.client.post(url)
+        self.client.post(url)
+        self.assertEqual(
+            self.get_counts(self.author, self.reader), [(1, 0), (0, 1)]
+        )
+
+        response = self.client.get("/api/profiles/author/")
+        self.assertEqual(response.data["followers_count"], 1)
+        self.assertEqual(response.data["following_count"], 0)
+        self.assertTrue(response.data["following"])
+
+        self.client.delete(url)
+        self.client.delete(url)
+        self.assertEqual(
+            self.get_counts(self.author, self.reader), [(0, 0), (0, 0)]
+        )
+
+    def test_changes_from_either_side(self):
+        other = create_profile("other")
+        self.reader.following.add(self.author, other)
+        self.author.followers.add(other)
+        self.assertEqual(
+            self.get_counts(self.author, self.reader, other),
+            [(2, 0), (0, 2), (1, 1)],
+        )
+
+        self.reader.following.clear()
+        self.assertEqual(
+            self.get_counts(self.author, self.reader, other),
+            [(1, 0), (0, 0), (0, 1)],
+        )
+
+    def follow_while_racing(self, follower, racer):
+        """Have `follower` follow the author while `racer` follows too"""
+        discard = signals.discard_existing_follows
+        raced = False
+
+        def race(*args):
+            # The racing follow lands after this one looked for missing links
+            nonlocal raced
+            if not raced:
+                raced = True
+                racer.following.add(self.author)
+            discard(*args)
+
+        with mock.patch.object(signals, "discard_existing_follows", race):
+            follower.following.add(self.author)
+
+    def test_racing_follows_of_one_profile(self):
+        self.follow_while_racing(self.reader, self.reader)
+        self.assertEqual(
+            self.get_counts(self.author, self.reader), [(1, 0), (0, 1)]
+        )
+
+    def test_racing_follows_by_different_profiles(self):
+        other = create_profile("other")
+        self.follow_while_racing(self.reader, other)
+        self.assertEqual(
+            self.get_counts(self.author, self.reader, other),
+            [(2, 0), (0, 1), (0, 1)],
+        )
+
+    def test_deleting_a_profile(self):
+        other = create_profile("other")
+        self.author.followers.add(self.reader, other)
+        self.reader.followers.add(self.author)
+
+        self.reader.user.delete()
+        self.assertEqual(self.get_counts(self.author, other), [(1, 0), (0, 1)])
+
+
+class FollowListTests(APITestCase):
+    """Followers and following are paged by keyset, newest follow first"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_profile("author")
+        cls.followers = [create_profile(f"follower{i}") for i in range(25)]
+        for follower in cls.followers:
+            cls.author.followers.add(follower)
+        cls.followers[0].following.add(*cls.followers[1:4])
+
+    def usernames(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [profile["username"] for profile in response.data["results"]]
+
+    def test_followers_pages(self):
+        newest_first = [f.user.username for f in reversed(self.followers)]
+
+        response = self.client.get("/api/profiles/author/followers/")
+        self.assertEqual(self.usernames(response), newest_first[:20])
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(self.usernames(response), newest_first[20:])
+        self.assertIsNone(response.data["next"])
+
+        response = self.client.get(response.data["previous"])
+        self.assertEqual(self.usernames(response), newest_first[:20])
+
+    def test_following_with_viewer_flags(self):
+        viewer = self.followers[0]
+        self.client.force_authenticate(viewer.user)
+        response = self.client.get("/api/profiles/follower0/following/")
+        self.assertEqual(
+            self.usernames(response),
+            ["follower3", "follower2", "follower1", "author"],
+        )
+        self.assertTrue(
+            all(profile["following"] for profile in response.data["results"])
+        )
+
+        response = self.client.get("/api/profiles/author/following/")
+        self.assertEqual(self.usernames(response), [])
+
+    def test_unknown_profile(self):
+        response = self.client.get("/api/profiles/missing/followers/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_queries_do_not_grow_with_the_page(self):
+        self.client.force_authenticate(self.followers[0].user)
+
+        def count_queries(limit):
+            url = f"/api/profiles/author/followers/?limit={limit}"
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(
+                    len(self.usernames(self.client.get(url))), limit
+                )
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(20))
@@ -14,6 +14,16 @@ urlpatterns = [
         views.FollowUnfollowProfileView.as_view(),
         name="profile-follow",
     ),
+    path(
+        "profiles/<str:username>/followers/",
+        views.FollowListView.as_view(relation="followers"),
+        name="profile-followers",
+    ),
+    path(
+        "profiles/<str:username>/following/",
+        views.FollowListView.as_view(relation="following"),
+        name="profile-following",
+    ),
     path(
         "user/", views.OwnProfileRetrieveUpdate.as_view(), name="profile-update"
     ),
@@ -1,12 +1,24 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
-from rest_framework.generics import RetrieveAPIView, RetrieveUpdateAPIView
+from rest_framework.generics import (
+    ListAPIView,
+    RetrieveAPIView,
+    RetrieveUpdateAPIView,
+)
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 
+from api.asyncviews import AsyncReadMixin
+
 from .models import Profile
-from .serializers import ProfileViewSerializer, OwnProfileViewUpdateSerializer
+from .serializers import (
+    ProfileViewSerializer,
+    OwnProfileViewUpdateSerializer,
+    aget_following_ids,
+)
 
 
 # Used Generics instead of ViewSets for learning purposes
@@ -14,7 +26,7 @@ from .serializers import ProfileViewSerializer, OwnProfileViewUpdateSerializer
 
 
 # Create your views here.
-class ProfileView(RetrieveAPIView):
+class ProfileView(AsyncReadMixin, RetrieveAPIView):
     queryset = Profile.objects.all()
     serializer_class = ProfileViewSerializer
     # This could be used for a route like: /profiles/<username>/
@@ -27,6 +39,20 @@ class ProfileView(RetrieveAPIView):
         profile = get_object_or_404(Profile, user__username=username)
         return profile
 
+    async def aget(self, request, *args, **kwargs):
+        username = self.kwargs.get("username")
+        try:
+            profile = await Profile.objects.select_related("user").aget(
+                user__username=username
+            )
+        except Profile.DoesNotExist:
+            raise Http404("No Profile matches the given query.")
+
+        context = self.get_serializer_context()
+        context["following_ids"] = await aget_following_ids(request, [profile])
+        serializer = self.get_serializer(profile, context=context)
+        return Response(serializer.data)
+
 
 class FollowUnfollowProfileView(APIView):
     permission_classes = [IsAuthenticated]
@@ -54,6 +80,49 @@ class FollowUnfollowProfileView(APIView):
         )
 
 
+class FollowPagination(CursorPagination):
+    """
+    Keyset pagination over the follow links of one profile, newest first,
+    along the (profile, id) indexes of the through table; never counts
+    """
+
+    ordering = "-id"
+    page_size = 20
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+
+class FollowListView(ListAPIView):
+    """
+    Profiles following (`relation = "followers"`) or followed by
+    (`relation = "following"`) a profile
+    """
+
+    serializer_class = ProfileViewSerializer
+    pagination_class = FollowPagination
+    relation = "followers"
+
+    def get_queryset(self):
+        profile = get_object_or_404(
+            Profile, user__username=self.kwargs.get("username")
+        )
+        links = Profile.followers.through.objects.all()
+        if self.relation == "followers":
+            return links.filter(from_profile=profile).select_related(
+                "to_profile__user"
+            )
+        return links.filter(to_profile=profile).select_related(
+            "from_profile__user"
+        )
+
+    def list(self, request, *args, **kwargs):
+        links = self.paginate_queryset(self.get_queryset())
+        field = "to_profile" if self.relation == "followers" else "from_profile"
+        profiles = [getattr(link, field) for link in links]
+        serializer = self.get_serializer(profiles, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
 class OwnProfileRetrieveUpdate(RetrieveUpdateAPIView):
     queryset = Profile.objects.all()
     serializer_class = OwnProfileViewUpdateSerializer